@@ -1,23 +1,148 @@
-import matplotlib.pyplot as plt
-import pandas as pd
-import seaborn as sns
-import networkx as nx
-from typing import List, Dict
+import functools
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, List, Dict, Optional
 from datetime import datetime
 from db import Database
 
+# matplotlib, numpy, pandas, seaborn и networkx загружаются при первом
+# построении отчета, а не при запуске приложения (их импорт занимает секунды)
+plt = np = pd = sns = nx = None
+_dependencies_lock = threading.Lock()
+
+def load_dependencies():
+    """Импорт библиотек визуализации; повторные вызовы ничего не делают.
+    
+    Можно вызывать из фонового потока, чтобы заранее прогреть отчеты.
+    """
+    global plt, np, pd, sns, nx
+    with _dependencies_lock:
+        if nx is not None:
+            return
+        import matplotlib.pyplot as _plt
+        import numpy as _np
+        import pandas as _pd
+        import seaborn as _sns
+        import networkx as _nx
+        plt, np, pd, sns, nx = _plt, _np, _pd, _sns, _nx
+
+class ReportCache:
+    """Результаты отчетов, привязанные к версии данных базы.
+    
+    Запись действительна, пока Database.data_version() не изменилась;
+    версия читается до расчета, поэтому результат, посчитанный во время
+    записи в базу, не будет выдан после нее. Результаты общие для всех
+    вызовов - их нельзя изменять.
+    """
+    
+    def __init__(self, db: Database, max_size: int = 16):
+        self.db = db
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: tuple, compute: Callable[[], Any]) -> Any:
+        version = self.db.data_version()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        
+        value = compute()
+        with self._lock:
+            if self.max_size > 0:
+                self._entries[key] = (version, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return value
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+def cached_report(method):
+    """Кэширует результат метода DataAnalyzer по имени и аргументам."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        return self.cache.get(key, lambda: method(self, *args, **kwargs))
+    return wrapper
+
 class DataAnalyzer:
-    def __init__(self, db: Database):
+    def __init__(self, db: Database, cache_size: int = 16):
         self.db = db
+        self.cache = ReportCache(db, cache_size)
     
-    def plot_top_clients(self, limit: int = 5):
+    # Методы load_* только читают данные и безопасны для фонового потока;
+    # plot_* рисуют графики и должны вызываться из главного потока tkinter.
+    # Результаты load_* и build_sales_report кэшируются до изменения данных.
+    def _frame(self, columns: Dict) -> 'pd.DataFrame':
+        # Числовые колонки - буферы array.array, оборачиваются без копирования
+        return pd.DataFrame({
+            name: np.frombuffer(values, dtype=values.typecode) if hasattr(values, 'typecode')
+            else pd.Categorical(values)
+            for name, values in columns.items()
+        })
+    
+    @cached_report
+    def load_order_items(self, start_date: Optional[str] = None,
+                         end_date: Optional[str] = None) -> 'pd.DataFrame':
+        """Позиции заказов с датой, статусом, клиентом и категорией товара.
+        
+        Данные читаются по колонкам без построчных объектов и соединяются
+        в pandas; все агрегаты отчетов считаются по этой таблице.
+        """
+        load_dependencies()
+        tables = self.db.get_order_item_columns(start_date, end_date)
+        orders = self._frame(tables['orders']).set_index('id')
+        products = self._frame(tables['products']).set_index('id')
+        
+        items = self._frame(tables['order_items'])
+        items = items.join(orders, on='order_id', how='inner').join(products, on='product_id')
+        items['revenue'] = items['quantity'] * items['unit_price']
+        return items.reset_index(drop=True)
+    
+    @cached_report
+    def load_top_clients(self, limit: int = 5) -> 'pd.DataFrame':
+        items = self.load_order_items()
+        top = (
+            items.groupby('client_id')
+            .agg(order_count=('order_id', 'nunique'), total_spent=('revenue', 'sum'))
+            .sort_values(['order_count', 'total_spent'], ascending=False)
+            .head(limit)
+        )
+        clients = self.db.get_clients_by_ids(top.index.tolist())
+        top['name'] = [
+            clients[client_id].name if client_id in clients else f"Клиент {client_id}"
+            for client_id in top.index
+        ]
+        return top.rename_axis('id').reset_index()
+    
+    def plot_top_clients(self, limit: int = 5, top_clients: Optional['pd.DataFrame'] = None):
         """Визуализация топ клиентов по количеству заказов"""
-        top_clients = self.db.get_top_clients(limit)
-        if not top_clients:
+        load_dependencies()
+        if top_clients is None:
+            top_clients = self.load_top_clients(limit)
+        if top_clients.empty:
             print("Нет данных о клиентах")
             return
         
-        df = pd.DataFrame(top_clients)
+        df = top_clients.copy()
         df['name'] = df['name'].str[:15] + '...'  # Обрезаем длинные имена
         
         plt.figure(figsize=(10, 6))
@@ -28,9 +153,17 @@ class DataAnalyzer:
         plt.tight_layout()
         plt.show()
     
-    def plot_sales_trend(self):
+    @cached_report
+    def load_sales_trend(self, start_date: Optional[str] = None,
+                         end_date: Optional[str] = None) -> List[Dict]:
+        # Динамика уже хранится по дням в сводной таблице daily_sales
+        return self.db.get_sales_by_date(start_date, end_date)
+    
+    def plot_sales_trend(self, sales_data: Optional[List[Dict]] = None):
         """График динамики продаж по датам"""
-        sales_data = self.db.get_sales_by_date()
+        load_dependencies()
+        if sales_data is None:
+            sales_data = self.load_sales_trend()
         if not sales_data:
             print("Нет данных о продажах")
             return
@@ -60,14 +193,32 @@ class DataAnalyzer:
         plt.tight_layout()
         plt.show()
     
-    def plot_top_products(self, limit: int = 10):
+    @cached_report
+    def load_product_sales(self) -> 'pd.DataFrame':
+        items = self.load_order_items()
+        sales = (
+            items.groupby('product_id')
+            .agg(
+                category=('category', 'first'),
+                total_quantity=('quantity', 'sum'),
+                total_revenue=('revenue', 'sum'),
+            )
+            .sort_values('total_revenue', ascending=False)
+        )
+        names = self.db.get_product_index()
+        sales['name'] = [names.name(product_id) for product_id in sales.index]
+        return sales.rename_axis('id').reset_index()
+    
+    def plot_top_products(self, limit: int = 10, product_sales: Optional['pd.DataFrame'] = None):
         """Топ товаров по количеству продаж и выручке"""
-        product_sales = self.db.get_product_sales()
-        if not product_sales:
+        load_dependencies()
+        if product_sales is None:
+            product_sales = self.load_product_sales()
+        if product_sales.empty:
             print("Нет данных о продажах товаров")
             return
         
-        df = pd.DataFrame(product_sales)
+        df = product_sales
         df = df[df['total_quantity'] > 0].sort_values('total_quantity', ascending=False).head(limit)
         df['name'] = df['name'].str[:15] + '...'  # Обрезаем длинные названия
         
@@ -90,15 +241,17 @@ class DataAnalyzer:
         plt.tight_layout()
         plt.show()
     
-    def plot_product_category_distribution(self):
+    def plot_product_category_distribution(self, product_sales: Optional['pd.DataFrame'] = None):
         """Распределение продаж по категориям"""
-        product_sales = self.db.get_product_sales()
-        if not product_sales:
+        load_dependencies()
+        if product_sales is None:
+            product_sales = self.load_product_sales()
+        if product_sales.empty:
             print("Нет данных о продажах товаров")
             return
         
-        df = pd.DataFrame(product_sales)
-        category_stats = df.groupby('category').agg({
+        df = product_sales
+        category_stats = df.groupby('category', observed=True).agg({
             'total_quantity': 'sum',
             'total_revenue': 'sum'
         }).reset_index()
@@ -128,10 +281,24 @@ class DataAnalyzer:
         plt.tight_layout()
         plt.show()
     
-    def plot_client_network(self):
+    @cached_report
+    def load_client_network(self) -> Dict:
+        items = self.load_order_items()
+        # Ребро клиент-товар: суммарное количество купленного товара
+        edges = items.groupby(['client_id', 'product_id'])['quantity'].sum()
+        return {
+            'edges': edges,
+            'clients': self.db.get_all_clients() if not edges.empty else [],
+            'products': self.db.get_products_by_ids(items['product_id'].unique().tolist()),
+        }
+    
+    def plot_client_network(self, network: Optional[Dict] = None):
         """Граф связей клиентов и товаров"""
-        orders = self.db.get_all_orders()
-        if not orders:
+        load_dependencies()
+        if network is None:
+            network = self.load_client_network()
+        edges = network['edges']
+        if edges.empty:
             print("Нет данных о заказах")
             return
         
@@ -139,18 +306,16 @@ class DataAnalyzer:
         G = nx.Graph()
         
         # Добавляем клиентов как узлы
-        clients = self.db.get_all_clients()
-        for client in clients:
+        for client in network['clients']:
             G.add_node(client.id, label=client.name, type='client')
         
         # Добавляем товары как узлы и связи между клиентами и товарами
-        for order in orders:
-            for item in order.items:
-                product = self.db.get_product(item.product_id)
-                if product:
-                    if product.id not in G:
-                        G.add_node(product.id, label=product.name, type='product')
-                    G.add_edge(order.client_id, product.id, weight=item.quantity)
+        for (client_id, product_id), quantity in edges.items():
+            product = network['products'].get(product_id)
+            if product:
+                if product.id not in G:
+                    G.add_node(product.id, label=product.name, type='product')
+                G.add_edge(client_id, product.id, weight=quantity)
         
         # Рисуем граф
         plt.figure(figsize=(12, 12))
@@ -197,48 +362,55 @@ class DataAnalyzer:
         plt.tight_layout()
         plt.show()
     
+    @cached_report
+    def build_sales_report(self, start_date: str, end_date: str) -> Optional[Dict]:
+        """Расчет метрик отчета о продажах за период (без вывода)"""
+        # Итоги и топ товаров считаются агрегирующими запросами в базе
+        summary = self.db.get_sales_summary(start_date, end_date, top_n=5)
+        if summary is None:
+            return None
+        
+        products = self.db.get_products_by_ids(row['product_id'] for row in summary['top_products'])
+        top_products = [
+            {
+                'quantity': row['quantity'],
+                'revenue': row['revenue'],
+                'product': products.get(row['product_id'])
+            }
+            for row in summary['top_products']
+        ]
+        
+        return {
+            'start_date': start_date,
+            'end_date': end_date,
+            'total_orders': summary['total_orders'],
+            'total_revenue': summary['total_revenue'],
+            'avg_order_value': summary['avg_order_value'],
+            'top_products': top_products,
+            'sales_trend': self.load_sales_trend(start_date, end_date),
+        }
+    
     def generate_sales_report(self, start_date: str, end_date: str):
         """Генерация отчета о продажах за период"""
-        orders = self.db.get_orders_by_date_range(start_date, end_date)
-        if not orders:
+        self.show_sales_report(start_date, end_date, self.build_sales_report(start_date, end_date))
+    
+    def show_sales_report(self, start_date: str, end_date: str, report: Optional[Dict]):
+        """Вывод отчета, рассчитанного build_sales_report"""
+        if report is None:
             print(f"Заказы не найдены в период с {start_date} по {end_date}")
             return
         
-        # Расчет метрик
-        total_orders = len(orders)
-        total_revenue = sum(order.total_amount for order in orders)
-        avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
-        
-        # Анализ товаров
-        product_sales = {}
-        for order in orders:
-            for item in order.items:
-                if item.product_id not in product_sales:
-                    product_sales[item.product_id] = {
-                        'quantity': 0,
-                        'revenue': 0.0,
-                        'product': self.db.get_product(item.product_id)
-                    }
-                product_sales[item.product_id]['quantity'] += item.quantity
-                product_sales[item.product_id]['revenue'] += item.total_price
-        
-        top_products = sorted(
-            product_sales.values(),
-            key=lambda x: x['revenue'],
-            reverse=True
-        )[:5]
-        
         # Вывод отчета
         print(f"\n=== Отчет о продажах ({start_date} по {end_date}) ===")
-        print(f"Всего заказов: {total_orders}")
-        print(f"Общая выручка: {total_revenue}₽")
-        print(f"Средний чек: {avg_order_value}₽")
+        print(f"Всего заказов: {report['total_orders']}")
+        print(f"Общая выручка: {report['total_revenue']}₽")
+        print(f"Средний чек: {report['avg_order_value']}₽")
         
         print("\nТоп товаров по выручке:")
-        for i, product in enumerate(top_products, 1):
+        for i, product in enumerate(report['top_products'], 1):
             p = product['product']
             if p:
                 print(f"{i}. {p.name} - {product['quantity']} шт. проданно ({product['revenue']}₽)")
         
         # График продаж
-        self.plot_sales_trend()
\ No newline at end of file
+        self.plot_sales_trend(report['sales_trend'])
\ No newline at end of file
@@ -0,0 +1,45 @@
+"""Замер памяти моделей: слотовые классы models.py против обычных dataclass.
+
+Запуск: python bench_models.py [количество объектов]
+"""
+import sys
+import tracemalloc
+from dataclasses import fields, make_dataclass
+from models import Client, Order, OrderItem, Product
+
+# Аргументы конструкторов. Строки и числа общие для всех объектов, поэтому
+# замер показывает накладные расходы самих объектов (у Order еще пустой список)
+SAMPLES = {
+    OrderItem: lambda: (1, 2, 99.5),
+    Product: lambda: (1, "Товар", 99.5, "Категория", 10),
+    Client: lambda: (1, "Иван", "ivan@example.com", "+79991234567", "Москва", "2024-01-01"),
+    Order: lambda: (1, 1, [], "2024-01-01", "pending"),
+}
+
+def dict_variant(cls):
+    # Тот же набор полей, но с __dict__ у каждого экземпляра (как было раньше)
+    return make_dataclass(f"Dict{cls.__name__}", [(f.name, f.type) for f in fields(cls)])
+
+def measure(factory, count: int) -> float:
+    """Средний прирост памяти на один объект, в байтах."""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [factory() for _ in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Список ссылок на объекты считаем отдельно от самих объектов
+    list_size = sys.getsizeof(objects)
+    return (after - before - list_size) / count
+
+def main(count: int = 100_000):
+    print(f"Объектов каждого типа: {count}")
+    print(f"{'Класс':<10} {'dict, байт':>12} {'slots, байт':>12} {'экономия':>10}")
+    for cls, args in SAMPLES.items():
+        legacy = dict_variant(cls)
+        with_dict = measure(lambda: legacy(*args()), count)
+        with_slots = measure(lambda: cls(*args()), count)
+        saving = 1 - with_slots / with_dict
+        print(f"{cls.__name__:<10} {with_dict:>12.0f} {with_slots:>12.0f} {saving:>9.0%}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -1,18 +1,603 @@
 import sqlite3
 import json
 import csv
-from typing import List, Dict, Type, Any, Optional
+import threading
+import copy
+import random
+from array import array
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import List, Dict, Type, Any, Optional, Iterator, Iterable, Tuple, Callable, NamedTuple
 from pathlib import Path
 from datetime import datetime
-from models import Client, Product, Order, OrderItem, PremiumClient
+from models import Client, Product, Order, OrderItem, PremiumClient, ValidationError, InsufficientStockError
+
+@dataclass
+class RowError:
+    row: int        # 1-based record number in the source file
+    message: str
+
+class Page(NamedTuple):
+    rows: list
+    # Keyset cursor (sort value, id) of the last row; pass it back as `after`
+    next_after: Optional[tuple]
+
+class OrderHeader(NamedTuple):
+    id: int
+    client_id: int
+    order_date: str
+    status: str
+    total_amount: float
+    item_count: int
+
+class OrderSummary(NamedTuple):
+    id: int
+    client_id: int
+    client_name: Optional[str]   # None if the client no longer exists
+    order_date: str
+    status: str
+    total_amount: float
+    item_count: int
+
+class ProductIndex:
+    """id -> name for the whole catalog, built from one light query; used by
+    order entry and reports instead of loading every Product."""
+    
+    def __init__(self, rows: Iterable[Tuple[int, str]]):
+        self.names: Dict[int, str] = dict(rows)
+    
+    def name(self, product_id: int) -> str:
+        return self.names.get(product_id, f"Товар {product_id}")
+
+@dataclass
+class ImportResult:
+    entity_type: str
+    imported: int = 0
+    errors: List[RowError] = field(default_factory=list)
+    
+    @property
+    def failed(self) -> int:
+        return len(self.errors)
+
+class ConnectionPool:
+    """Long-lived SQLite connections, one per thread, tuned once on open."""
+
+    PRAGMAS = (
+        "PRAGMA journal_mode = WAL",
+        "PRAGMA synchronous = NORMAL",
+        "PRAGMA cache_size = -20000",      # ~20 MB page cache
+        "PRAGMA mmap_size = 268435456",    # 256 MB memory-mapped I/O
+        "PRAGMA temp_store = MEMORY",
+    )
+
+    def __init__(self, db_path: str, timeout: float = 5.0):
+        self.db_path = db_path
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        # thread ident -> (thread, connection)
+        self._connections: Dict[int, tuple] = {}
+        # Data version: bumped by commits that changed rows and by changes
+        # from other connections (PRAGMA data_version, tracked per thread)
+        self._version = 0
+        self._seen_versions: Dict[int, int] = {}
+        self._opened = 0
+        self._closed = 0
+        self._checkouts = 0
+
+    def _open(self) -> sqlite3.Connection:
+        # check_same_thread is off only so that close() can run from any thread;
+        # each connection is still used exclusively by the thread that owns it.
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout, check_same_thread=False)
+        for pragma in self.PRAGMAS:
+            conn.execute(pragma)
+        conn.create_function("casefold", 1, _casefold, deterministic=True)
+        return conn
+
+    def _prune(self):
+        # Drop connections whose owning threads have finished
+        for ident, (thread, conn) in list(self._connections.items()):
+            if not thread.is_alive():
+                conn.close()
+                del self._connections[ident]
+                self._seen_versions.pop(ident, None)
+                self._closed += 1
+
+    def acquire(self) -> sqlite3.Connection:
+        thread = threading.current_thread()
+        with self._lock:
+            self._checkouts += 1
+            entry = self._connections.get(thread.ident)
+            if entry is not None and entry[0] is thread:
+                return entry[1]
+            self._prune()
+        conn = self._open()
+        seen = conn.execute("PRAGMA data_version").fetchone()[0]
+        with self._lock:
+            self._connections[thread.ident] = (thread, conn)
+            self._seen_versions[thread.ident] = seen
+            self._opened += 1
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """Yield this thread's connection; commit on success, roll back on error."""
+        conn = self.acquire()
+        changes = conn.total_changes
+        with conn:
+            yield conn
+        if conn.total_changes != changes:
+            with self._lock:
+                self._version += 1
+    
+    def data_version(self) -> int:
+        """Counter that changes whenever committed data may have changed.
+        
+        Commits through this pool bump it directly; commits by other
+        processes are noticed via PRAGMA data_version on the calling
+        thread's connection. A commit from another thread of this process
+        can bump it twice, which only costs an extra recomputation.
+        """
+        conn = self.acquire()
+        current = conn.execute("PRAGMA data_version").fetchone()[0]
+        ident = threading.get_ident()
+        with self._lock:
+            if self._seen_versions.get(ident) != current:
+                self._seen_versions[ident] = current
+                self._version += 1
+            return self._version
+
+    def close(self):
+        with self._lock:
+            for thread, conn in self._connections.values():
+                conn.close()
+                self._closed += 1
+            self._connections.clear()
+            self._seen_versions.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'open_connections': len(self._connections),
+                'opened': self._opened,
+                'closed': self._closed,
+                'checkouts': self._checkouts,
+                'reused': self._checkouts - self._opened,
+            }
+
+class EntityCache:
+    """Thread-safe LRU map of id -> client/product with hit/miss counters.
+    
+    Entities are copied in and out, so callers may mutate what they get
+    (Order.add_item decrements product.stock) without touching the cache.
+    Every invalidation bumps a generation counter; a value read from the
+    database before an invalidation is not stored afterwards, so a reader
+    racing a writer cannot re-cache a stale row.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, keys: Iterable[int]) -> Tuple[Dict[int, Any], List[int], int]:
+        """Return (cached entities by id, missing ids, generation for put())."""
+        found, missing = {}, []
+        with self._lock:
+            for key in keys:
+                entity = self._entries.get(key)
+                if entity is None:
+                    missing.append(key)
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = copy.copy(entity)
+            self.hits += len(found)
+            self.misses += len(missing)
+            return found, missing, self._generation
+
+    def put(self, key: int, entity: Any, generation: int):
+        with self._lock:
+            if generation != self._generation or self.max_size <= 0:
+                return
+            self._entries[key] = copy.copy(entity)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, keys: Optional[Iterable[int]] = None):
+        """Drop the given ids, or everything when keys is None."""
+        with self._lock:
+            self._generation += 1
+            if keys is None:
+                self._entries.clear()
+            else:
+                for key in keys:
+                    self._entries.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+def _is_busy(error: sqlite3.OperationalError) -> bool:
+    # SQLITE_BUSY / SQLITE_LOCKED, including extended codes; the error code
+    # attribute needs Python 3.11, older versions only have the message
+    code = getattr(error, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xff in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return "locked" in str(error) or "busy" in str(error)
+
+def _extend_column(column, values: tuple):
+    """Append values to a text list or typed array column; returns the column.
+    
+    SQLite's loose typing lets an INTEGER column hold REAL values: whole ones
+    (2.0) are stored as ints, anything else widens the column to floats.
+    """
+    if not isinstance(column, array):
+        column.extend(values)
+        return column
+    try:
+        # Converted as a whole first: a failed array.extend leaves a partial batch
+        column.extend(array(column.typecode, values))
+    except TypeError:
+        if column.typecode != 'q':
+            raise
+        values = [int(v) if isinstance(v, float) and v.is_integer() else v for v in values]
+        try:
+            column.extend(array('q', values))
+        except TypeError:
+            column = array('d', column)
+            column.extend(array('d', values))
+    return column
+
+def _casefold(value):
+    # Registered as casefold() on every connection: unlike LIKE/lower(),
+    # it folds Cyrillic and other non-ASCII letters
+    return value.casefold() if isinstance(value, str) else value
+
+def _fts5_trigram_available(conn: sqlite3.Connection) -> bool:
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x, tokenize='trigram')")
+        conn.execute("DROP TABLE temp.fts5_probe")
+        return True
+    except sqlite3.OperationalError:
+        return False
+
+# Columns mirrored into the full-text index of each searchable table
+SEARCH_COLUMNS = {
+    "clients": ('name', 'email', 'phone'),
+    "products": ('name', 'category'),
+}
+
+def _create_search_index(conn: sqlite3.Connection):
+    """Trigram FTS5 tables over clients and products, kept in sync by triggers.
+    
+    Skipped when the SQLite build lacks FTS5/trigram; searches then fall
+    back to scanning the base tables.
+    """
+    if not _fts5_trigram_available(conn):
+        return
+    
+    for table, columns in SEARCH_COLUMNS.items():
+        cols = ", ".join(columns)
+        new_values = ", ".join(f"new.{c}" for c in columns)
+        old_values = ", ".join(f"old.{c}" for c in columns)
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(
+                {cols}, content='{table}', content_rowid='id', tokenize='trigram'
+            )
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_fts_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {table}_fts (rowid, {cols}) VALUES (new.id, {new_values});
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_fts_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {table}_fts ({table}_fts, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_fts_au AFTER UPDATE ON {table} BEGIN
+                INSERT INTO {table}_fts ({table}_fts, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+                INSERT INTO {table}_fts (rowid, {cols}) VALUES (new.id, {new_values});
+            END
+        """)
+        conn.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+
+# Recomputes one order's stored totals from its lines; the covering index
+# idx_order_items_order makes this a short index range scan
+_ORDER_TOTALS_SET = """
+    total_amount = (SELECT COALESCE(SUM(quantity * unit_price), 0)
+                    FROM order_items WHERE order_id = {ref}),
+    item_count = (SELECT COUNT(*) FROM order_items WHERE order_id = {ref})
+"""
+
+def _add_order_totals(conn: sqlite3.Connection):
+    """Persisted orders.total_amount / item_count, kept current by triggers
+    on order_items so order-level queries never aggregate the lines."""
+    # Skip columns that already exist, so an interrupted upgrade can re-run
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(orders)")}
+    if "total_amount" not in existing:
+        conn.execute("ALTER TABLE orders ADD COLUMN total_amount REAL NOT NULL DEFAULT 0")
+    if "item_count" not in existing:
+        conn.execute("ALTER TABLE orders ADD COLUMN item_count INTEGER NOT NULL DEFAULT 0")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS order_items_totals_ai AFTER INSERT ON order_items BEGIN
+            UPDATE orders SET {_ORDER_TOTALS_SET.format(ref='new.order_id')} WHERE id = new.order_id;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS order_items_totals_ad AFTER DELETE ON order_items BEGIN
+            UPDATE orders SET {_ORDER_TOTALS_SET.format(ref='old.order_id')} WHERE id = old.order_id;
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS order_items_totals_au
+        AFTER UPDATE OF order_id, quantity, unit_price ON order_items BEGIN
+            UPDATE orders SET {_ORDER_TOTALS_SET.format(ref='old.order_id')} WHERE id = old.order_id;
+            UPDATE orders SET {_ORDER_TOTALS_SET.format(ref='new.order_id')}
+            WHERE id = new.order_id AND new.order_id != old.order_id;
+        END
+    """)
+    conn.execute(f"UPDATE orders SET {_ORDER_TOTALS_SET.format(ref='orders.id')}")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_total_amount ON orders (total_amount)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_item_count ON orders (item_count)")
+
+def _sales_line_delta(ref: str, sign: str, skip_new: bool = False) -> List[str]:
+    # Adds (sign '+') or removes (sign '-') one order line in the rollups. The
+    # line's order counts towards order_count while it is the order's only line.
+    # In an UPDATE trigger the row already holds the new values, so the old
+    # side passes skip_new to not mistake it for another line of the order.
+    other_lines = f"order_id = {ref}.order_id AND product_id != {ref}.product_id"
+    if skip_new:
+        other_lines += " AND NOT (order_id = new.order_id AND product_id = new.product_id)"
+    return [f"""
+        INSERT INTO daily_sales (sale_date, status, order_count, revenue, units)
+        SELECT o.order_date, o.status,
+               {sign}NOT EXISTS (SELECT 1 FROM order_items WHERE {other_lines}),
+               {sign}{ref}.quantity * {ref}.unit_price, {sign}{ref}.quantity
+        FROM orders o WHERE o.id = {ref}.order_id
+        ON CONFLICT (sale_date, status) DO UPDATE SET
+            order_count = order_count + excluded.order_count,
+            revenue = revenue + excluded.revenue,
+            units = units + excluded.units;
+    """, f"""
+        INSERT INTO daily_category_sales (sale_date, status, category, revenue, units)
+        SELECT o.order_date, o.status, COALESCE(p.category, ''),
+               {sign}{ref}.quantity * {ref}.unit_price, {sign}{ref}.quantity
+        FROM orders o LEFT JOIN products p ON p.id = {ref}.product_id
+        WHERE o.id = {ref}.order_id
+        ON CONFLICT (sale_date, status, category) DO UPDATE SET
+            revenue = revenue + excluded.revenue,
+            units = units + excluded.units;
+    """]
+
+def _sales_order_delta(ref: str, sign: str) -> List[str]:
+    # Adds or removes a whole order (all its lines) under its date and status
+    return [f"""
+        INSERT INTO daily_sales (sale_date, status, order_count, revenue, units)
+        SELECT {ref}.order_date, {ref}.status, {sign}1,
+               {sign}SUM(quantity * unit_price), {sign}SUM(quantity)
+        FROM order_items WHERE order_id = {ref}.id
+        HAVING COUNT(*) > 0
+        ON CONFLICT (sale_date, status) DO UPDATE SET
+            order_count = order_count + excluded.order_count,
+            revenue = revenue + excluded.revenue,
+            units = units + excluded.units;
+    """, f"""
+        INSERT INTO daily_category_sales (sale_date, status, category, revenue, units)
+        SELECT {ref}.order_date, {ref}.status, COALESCE(p.category, ''),
+               {sign}SUM(oi.quantity * oi.unit_price), {sign}SUM(oi.quantity)
+        FROM order_items oi LEFT JOIN products p ON p.id = oi.product_id
+        WHERE oi.order_id = {ref}.id
+        GROUP BY COALESCE(p.category, '')
+        ON CONFLICT (sale_date, status, category) DO UPDATE SET
+            revenue = revenue + excluded.revenue,
+            units = units + excluded.units;
+    """]
+
+# Recomputes both rollups from scratch
+_SALES_ROLLUP_BACKFILL = [
+    "DELETE FROM daily_sales",
+    "DELETE FROM daily_category_sales",
+    """
+    INSERT INTO daily_sales (sale_date, status, order_count, revenue, units)
+    SELECT o.order_date, o.status, COUNT(DISTINCT o.id),
+           SUM(oi.quantity * oi.unit_price), SUM(oi.quantity)
+    FROM orders o JOIN order_items oi ON oi.order_id = o.id
+    GROUP BY o.order_date, o.status
+    """,
+    """
+    INSERT INTO daily_category_sales (sale_date, status, category, revenue, units)
+    SELECT o.order_date, o.status, COALESCE(p.category, ''),
+           SUM(oi.quantity * oi.unit_price), SUM(oi.quantity)
+    FROM orders o
+    JOIN order_items oi ON oi.order_id = o.id
+    LEFT JOIN products p ON p.id = oi.product_id
+    GROUP BY o.order_date, o.status, COALESCE(p.category, '')
+    """,
+]
+
+def _create_sales_rollup(conn: sqlite3.Connection):
+    """Per-day sales rollups (overall and per category), keyed by order status
+    so a status change just moves an order between rows. Triggers on
+    order_items and orders keep them current; trend reports read O(days)
+    rows instead of joining every order line."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS daily_sales (
+            sale_date TEXT NOT NULL,
+            status TEXT NOT NULL,
+            order_count INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            units INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (sale_date, status)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS daily_category_sales (
+            sale_date TEXT NOT NULL,
+            status TEXT NOT NULL,
+            category TEXT NOT NULL,
+            revenue REAL NOT NULL DEFAULT 0,
+            units INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (sale_date, status, category)
+        ) WITHOUT ROWID
+    """)
+    triggers = {
+        "order_items_sales_ai AFTER INSERT ON order_items": _sales_line_delta("new", "+"),
+        "order_items_sales_ad AFTER DELETE ON order_items": _sales_line_delta("old", "-"),
+        "order_items_sales_au AFTER UPDATE OF order_id, product_id, quantity, unit_price ON order_items":
+            _sales_line_delta("old", "-", skip_new=True) + _sales_line_delta("new", "+"),
+        """orders_sales_au AFTER UPDATE OF order_date, status ON orders
+           WHEN old.order_date != new.order_date OR old.status != new.status""":
+            _sales_order_delta("old", "-") + _sales_order_delta("new", "+"),
+        "orders_sales_ad AFTER DELETE ON orders": _sales_order_delta("old", "-"),
+    }
+    for header, statements in triggers.items():
+        conn.execute(f"CREATE TRIGGER IF NOT EXISTS {header} BEGIN {''.join(statements)} END")
+    for statement in _SALES_ROLLUP_BACKFILL:
+        conn.execute(statement)
+
+def _fix_sales_line_update(conn: sqlite3.Connection):
+    """Recreate order_items_sales_au, which counted a phantom order when an
+    UPDATE changed a line's order_id or product_id, and rebuild the rollups."""
+    conn.execute("DROP TRIGGER IF EXISTS order_items_sales_au")
+    # Recreates only the dropped trigger, then backfills both rollups
+    _create_sales_rollup(conn)
 
 class Database:
-    def __init__(self, db_path: str = "shop.db"):
+    # Versioned schema changes applied on top of the base tables. Each entry is
+    # either a list of statements or a callable taking the connection, run in
+    # one BEGIN IMMEDIATE transaction together with the PRAGMA user_version
+    # bump that records how many entries the database file has received.
+    MIGRATIONS = [
+        # 1: secondary and covering indexes for order lookups and analytics
+        [
+            "CREATE INDEX IF NOT EXISTS idx_orders_client_id ON orders (client_id)",
+            "CREATE INDEX IF NOT EXISTS idx_orders_order_date ON orders (order_date)",
+            "CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status)",
+            # get_product_sales: product_id -> quantity, unit_price without table lookups
+            """CREATE INDEX IF NOT EXISTS idx_order_items_product
+               ON order_items (product_id, quantity, unit_price)""",
+            # get_top_clients / get_sales_by_date / order loading: order_id -> line values
+            """CREATE INDEX IF NOT EXISTS idx_order_items_order
+               ON order_items (order_id, product_id, quantity, unit_price)""",
+        ],
+        # 2: full-text search over clients and products
+        _create_search_index,
+        # 3: indexes behind sortable table columns (ORDER BY col, id)
+        [
+            "CREATE INDEX IF NOT EXISTS idx_clients_name ON clients (name)",
+            "CREATE INDEX IF NOT EXISTS idx_clients_phone ON clients (phone)",
+            "CREATE INDEX IF NOT EXISTS idx_clients_registration_date ON clients (registration_date)",
+            "CREATE INDEX IF NOT EXISTS idx_products_name ON products (name)",
+            "CREATE INDEX IF NOT EXISTS idx_products_price ON products (price)",
+            "CREATE INDEX IF NOT EXISTS idx_products_category ON products (category)",
+            "CREATE INDEX IF NOT EXISTS idx_products_stock ON products (stock)",
+        ],
+        # 4: denormalized order totals maintained by triggers
+        _add_order_totals,
+        # 5: daily sales rollups maintained by triggers
+        _create_sales_rollup,
+        # 6: correct order_count maintenance on order line key changes
+        _fix_sales_line_update,
+        # 7: indexes for the remaining sortable client columns
+        [
+            "CREATE INDEX IF NOT EXISTS idx_clients_address ON clients (address)",
+            "CREATE INDEX IF NOT EXISTS idx_clients_is_premium ON clients (is_premium)",
+        ],
+    ]
+    
+    # Sort keys accepted by the *_page methods, mapped to SQL expressions;
+    # each must be backed by an index so a page never sorts the whole table
+    SORT_COLUMNS = {
+        "clients": {
+            "id": "id", "name": "name", "email": "email", "phone": "phone",
+            "address": "address", "registration_date": "registration_date",
+            "is_premium": "is_premium",
+        },
+        "products": {
+            "id": "id", "name": "name", "price": "price",
+            "category": "category", "stock": "stock",
+        },
+        "orders": {
+            "id": "o.id",
+            "order_date": "o.order_date",
+            "status": "o.status",
+            "total_amount": "o.total_amount",
+            "item_count": "o.item_count",
+        },
+    }
+    
+    IMPORT_BATCH_SIZE = 2000
+    EXPORT_BATCH_SIZE = 1000
+    PAGE_SIZE = 200
+    BUSY_RETRIES = 5        # extra attempts for a checkout that hit SQLITE_BUSY
+    BUSY_BACKOFF = 0.05     # seconds, doubled on every retry
+    
+    def __init__(self, db_path: str = "shop.db", cache_size: int = 1000):
+        """`cache_size` bounds the client and product caches (entries each);
+        0 disables caching."""
         self.db_path = db_path
+        self.pool = ConnectionPool(db_path)
+        self.client_cache = EntityCache(cache_size)
+        self.product_cache = EntityCache(cache_size)
         self._init_db()
     
+    def close(self):
+        self.pool.close()
+    
+    def data_version(self) -> int:
+        """Changes whenever the data may have changed; see ConnectionPool.data_version."""
+        return self.pool.data_version()
+    
+    def pool_stats(self) -> Dict[str, int]:
+        return self.pool.stats()
+    
+    def cache_stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            'clients': self.client_cache.stats(),
+            'products': self.product_cache.stats(),
+        }
+    
+    def _variable_limit(self, conn: sqlite3.Connection) -> int:
+        # Max bound parameters per statement (SQLITE_MAX_VARIABLE_NUMBER);
+        # Connection.getlimit needs Python 3.11, older builds default to 999
+        if hasattr(conn, "getlimit"):
+            return conn.getlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER)
+        return 999
+    
+    def _get_many(self, table: str, cache: EntityCache, ids: Iterable[int],
+                  build: Callable[[Dict], Any]) -> Dict[int, Any]:
+        # Read-through lookup: cached entities first, then one IN (...) query
+        # per chunk of missing ids, each chunk under the variable limit
+        found, missing, generation = cache.lookup(dict.fromkeys(ids))
+        if not missing:
+            return found
+        with self.pool.connection() as conn:
+            chunk_size = self._variable_limit(conn)
+            for start in range(0, len(missing), chunk_size):
+                chunk = missing[start:start + chunk_size]
+                placeholders = ", ".join("?" * len(chunk))
+                cursor = conn.execute(f"SELECT * FROM {table} WHERE id IN ({placeholders})", chunk)
+                columns = [desc[0] for desc in cursor.description]
+                for row in cursor.fetchall():
+                    entity = build(dict(zip(columns, row)))
+                    cache.put(entity.id, entity, generation)
+                    found[entity.id] = entity
+        return found
+    
     def _init_db(self):
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             
             # Create tables if they don't exist
@@ -61,138 +646,475 @@ class Database:
             """)
             
             conn.commit()
+        
+        self._migrate()
+        self.fts_enabled = self._table_exists("clients_fts")
+    
+    def _table_exists(self, name: str) -> bool:
+        with self.pool.connection() as conn:
+            return conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = ?", (name,)
+            ).fetchone() is not None
+    
+    def schema_version(self) -> int:
+        with self.pool.connection() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+    
+    def _migrate(self):
+        version = self.schema_version()
+        if version >= len(self.MIGRATIONS):
+            return
+        
+        applied = False
+        for number, migration in enumerate(self.MIGRATIONS[version:], start=version + 1):
+            # BEGIN IMMEDIATE keeps DDL (which sqlite3 would otherwise
+            # autocommit) in the same transaction as the version bump
+            applied |= self._write_immediate(
+                lambda conn: self._apply_migration(conn, number, migration)
+            )
+        
+        if applied:
+            self.analyze()
+    
+    def _apply_migration(self, conn: sqlite3.Connection, number: int, migration) -> bool:
+        # Re-read under the write lock: another process opening the same
+        # file may have applied this step since schema_version() was checked
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= number:
+            return False
+        if callable(migration):
+            migration(conn)
+        else:
+            for statement in migration:
+                conn.execute(statement)
+        # PRAGMA values cannot be bound as parameters
+        conn.execute(f"PRAGMA user_version = {int(number)}")
+        return True
+    
+    def analyze(self):
+        """Refresh planner statistics; call after bulk loads and schema changes."""
+        with self.pool.connection() as conn:
+            conn.execute("ANALYZE")
     
     def _dict_to_client(self, data: Dict) -> Client:
-        if data.get('is_premium'):
-            return PremiumClient(**{k: v for k, v in data.items() if k != 'is_premium'})
-        return Client(**{k: v for k, v in data.items() if k != 'is_premium'})
+        return Client.from_dict(data)
+    
+    _CLIENT_INSERT = """
+        INSERT INTO clients (name, email, phone, address, registration_date, is_premium)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """
+    
+    def _client_params(self, client: Client) -> tuple:
+        is_premium = 1 if isinstance(client, PremiumClient) else 0
+        return (
+            client.name, client.email, client.phone, 
+            client.address, client.registration_date, is_premium
+        )
+    
+    def _insert_clients(self, conn: sqlite3.Connection, clients: List[Client]):
+        conn.executemany(self._CLIENT_INSERT, [self._client_params(c) for c in clients])
     
     def add_client(self, client: Client) -> int:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            is_premium = 1 if isinstance(client, PremiumClient) else 0
-            cursor.execute("""
-                INSERT INTO clients (name, email, phone, address, registration_date, is_premium)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (
-                client.name, client.email, client.phone, 
-                client.address, client.registration_date, is_premium
-            ))
-            conn.commit()
+        with self.pool.connection() as conn:
+            cursor = conn.execute(self._CLIENT_INSERT, self._client_params(client))
             return cursor.lastrowid
     
     def get_client(self, client_id: int) -> Optional[Client]:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM clients WHERE id = ?", (client_id,))
-            row = cursor.fetchone()
-            if row:
-                columns = [desc[0] for desc in cursor.description]
-                client_data = dict(zip(columns, row))
-                return self._dict_to_client(client_data)
-            return None
+        return self._get_many("clients", self.client_cache, [client_id], self._dict_to_client).get(client_id)
+    
+    def get_clients_by_ids(self, client_ids: Iterable[int]) -> Dict[int, Client]:
+        """Clients keyed by id; unknown ids are absent from the result."""
+        return self._get_many("clients", self.client_cache, client_ids, self._dict_to_client)
+    
+    def get_clients(self, client_ids: Iterable[int]) -> List[Client]:
+        """Clients with the given ids, in that order; unknown ids are skipped."""
+        client_ids = list(client_ids)
+        found = self.get_clients_by_ids(client_ids)
+        return [found[i] for i in client_ids if i in found]
     
     def get_all_clients(self) -> List[Client]:
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM clients")
+            cursor.execute("""
+                SELECT id, name, email, phone, address, registration_date, is_premium
+                FROM clients
+            """)
+            return [Client.from_row(row) for row in cursor.fetchall()]
+    
+    # Keyset pagination: a page continues after the (sort value, id) of the
+    # last row already shown, so fetching page N costs the same as page 1
+    # (no OFFSET scans) and id breaks ties for a stable order.
+    def _keyset(self, table: str, id_expr: str, sort_by: str, descending: bool,
+                after: Optional[tuple]) -> Tuple[str, str, list, str]:
+        """Return (sort expression, WHERE condition, params, ORDER BY clause)."""
+        columns = self.SORT_COLUMNS[table]
+        if sort_by not in columns:
+            raise ValueError(f"Cannot sort {table} by {sort_by!r}")
+        sort_expr = columns[sort_by]
+        direction = "DESC" if descending else "ASC"
+        op = "<" if descending else ">"
+        
+        if sort_expr == id_expr:
+            condition = f"{id_expr} {op} ?" if after else ""
+            params = [after[1]] if after else []
+            return sort_expr, condition, params, f"{id_expr} {direction}"
+        
+        condition = f"({sort_expr}, {id_expr}) {op} (?, ?)" if after else ""
+        params = list(after) if after else []
+        return sort_expr, condition, params, f"{sort_expr} {direction}, {id_expr} {direction}"
+    
+    def _fetch_page(self, table: str, after: Optional[tuple], limit: Optional[int],
+                    sort_by: str, descending: bool) -> Tuple[List[Dict], Optional[tuple]]:
+        sort_expr, condition, params, order = self._keyset(table, "id", sort_by, descending, after)
+        where = f"WHERE {condition}" if condition else ""
+        with self.pool.connection() as conn:
+            cursor = conn.execute(f"""
+                SELECT *, {sort_expr} AS sort_key FROM {table}
+                {where}
+                ORDER BY {order}
+                LIMIT ?
+            """, params + [limit or self.PAGE_SIZE])
             columns = [desc[0] for desc in cursor.description]
-            return [self._dict_to_client(dict(zip(columns, row))) for row in cursor.fetchall()]
+            records = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        
+        next_after = (records[-1]['sort_key'], records[-1]['id']) if records else None
+        for record in records:
+            del record['sort_key']
+        return records, next_after
+    
+    def get_clients_page(self, after: Optional[tuple] = None, limit: Optional[int] = None,
+                         sort_by: str = "id", descending: bool = False) -> Page:
+        records, next_after = self._fetch_page("clients", after, limit, sort_by, descending)
+        return Page([self._dict_to_client(data) for data in records], next_after)
+    
+    def delete_client(self, client_id: int):
+        with self.pool.connection() as conn:
+            # Remove the client's orders and their items first (uses idx_orders_client_id)
+            conn.execute("""
+                DELETE FROM order_items
+                WHERE order_id IN (SELECT id FROM orders WHERE client_id = ?)
+            """, (client_id,))
+            conn.execute("DELETE FROM orders WHERE client_id = ?", (client_id,))
+            conn.execute("DELETE FROM clients WHERE id = ?", (client_id,))
+        self.client_cache.invalidate([client_id])
+    
+    _PRODUCT_INSERT = """
+        INSERT INTO products (name, price, category, stock)
+        VALUES (?, ?, ?, ?)
+    """
+    
+    def _insert_products(self, conn: sqlite3.Connection, products: List[Product]):
+        conn.executemany(self._PRODUCT_INSERT, [
+            (p.name, p.price, p.category, p.stock) for p in products
+        ])
     
     def add_product(self, product: Product) -> int:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO products (name, price, category, stock)
-                VALUES (?, ?, ?, ?)
-            """, (product.name, product.price, product.category, product.stock))
-            conn.commit()
+        with self.pool.connection() as conn:
+            cursor = conn.execute(self._PRODUCT_INSERT, (
+                product.name, product.price, product.category, product.stock
+            ))
             return cursor.lastrowid
     
+    def _build_product(self, data: Dict) -> Product:
+        return Product.from_dict(data)
+    
     def get_product(self, product_id: int) -> Optional[Product]:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM products WHERE id = ?", (product_id,))
-            row = cursor.fetchone()
-            if row:
-                columns = [desc[0] for desc in cursor.description]
-                return Product(**dict(zip(columns, row)))
-            return None
+        return self._get_many("products", self.product_cache, [product_id], self._build_product).get(product_id)
+    
+    def get_products_by_ids(self, product_ids: Iterable[int]) -> Dict[int, Product]:
+        """Products keyed by id; unknown ids are absent from the result."""
+        return self._get_many("products", self.product_cache, product_ids, self._build_product)
+    
+    def get_products(self, product_ids: Iterable[int]) -> List[Product]:
+        """Products with the given ids, in that order; unknown ids are skipped."""
+        product_ids = list(product_ids)
+        found = self.get_products_by_ids(product_ids)
+        return [found[i] for i in product_ids if i in found]
     
     def get_all_products(self) -> List[Product]:
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM products")
-            columns = [desc[0] for desc in cursor.description]
-            return [Product(**dict(zip(columns, row))) for row in cursor.fetchall()]
+            cursor.execute("SELECT id, name, price, category, stock FROM products")
+            return [Product.from_row(row) for row in cursor.fetchall()]
+    
+    def get_product_index(self) -> ProductIndex:
+        with self.pool.connection() as conn:
+            return ProductIndex(conn.execute("SELECT id, name FROM products ORDER BY id"))
+    
+    def get_products_page(self, after: Optional[tuple] = None, limit: Optional[int] = None,
+                          sort_by: str = "id", descending: bool = False) -> Page:
+        records, next_after = self._fetch_page("products", after, limit, sort_by, descending)
+        return Page([Product.from_dict(data) for data in records], next_after)
+    
+    def delete_product(self, product_id: int):
+        with self.pool.connection() as conn:
+            # Remove order lines referencing the product (uses idx_order_items_product)
+            conn.execute("DELETE FROM order_items WHERE product_id = ?", (product_id,))
+            conn.execute("DELETE FROM products WHERE id = ?", (product_id,))
+        self.product_cache.invalidate([product_id])
+    
+    def _reserve_stock(self, conn: sqlite3.Connection, items: List[OrderItem]):
+        """Decrement stock for the items, refusing to go below zero.
+        
+        Each product is checked and decremented by the same conditional
+        UPDATE, so the check cannot act on a stale read. Raises
+        InsufficientStockError; the caller's transaction is then rolled back.
+        """
+        quantities: Dict[int, int] = {}
+        for item in items:
+            quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+        
+        for product_id, quantity in quantities.items():
+            cursor = conn.execute("""
+                UPDATE products
+                SET stock = stock - ?
+                WHERE id = ? AND stock >= ?
+            """, (quantity, product_id, quantity))
+            if cursor.rowcount == 0:
+                row = conn.execute("SELECT stock FROM products WHERE id = ?", (product_id,)).fetchone()
+                raise InsufficientStockError(product_id, quantity, row[0] if row else None)
+    
+    def _insert_orders(self, conn: sqlite3.Connection, orders: List[Order],
+                       reserve_stock: bool = False) -> List[int]:
+        """Insert a batch of orders with one executemany per table.
+        
+        executemany cannot report row ids, so the batch's ids are allocated
+        up front from the AUTOINCREMENT sequence; the caller must already
+        hold the write lock (BEGIN IMMEDIATE) so nobody else takes them.
+        Stock decrements are summed per product first.
+        """
+        if not orders:
+            return []
+        next_id = conn.execute("""
+            SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'orders'), 0),
+                       COALESCE((SELECT MAX(id) FROM orders), 0)) + 1
+        """).fetchone()[0]
+        order_ids = list(range(next_id, next_id + len(orders)))
+        
+        items = [item for order in orders for item in order.items]
+        if reserve_stock:
+            self._reserve_stock(conn, items)
+        
+        conn.executemany("""
+            INSERT INTO orders (id, client_id, order_date, status)
+            VALUES (?, ?, ?, ?)
+        """, [
+            (order_id, order.client_id, order.order_date, order.status)
+            for order_id, order in zip(order_ids, orders)
+        ])
+        conn.executemany("""
+            INSERT INTO order_items (order_id, product_id, quantity, unit_price)
+            VALUES (?, ?, ?, ?)
+        """, [
+            (order_id, item.product_id, item.quantity, item.unit_price)
+            for order_id, order in zip(order_ids, orders)
+            for item in order.items
+        ])
+        
+        if not reserve_stock:
+            quantities: Dict[int, int] = {}
+            for item in items:
+                quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+            conn.executemany("""
+                UPDATE products 
+                SET stock = stock - ?
+                WHERE id = ?
+            """, [(quantity, product_id) for product_id, quantity in quantities.items()])
+        return order_ids
+    
+    def _write_immediate(self, write: Callable[[sqlite3.Connection], Any]) -> Any:
+        # Run write(conn) in a BEGIN IMMEDIATE transaction, retrying with
+        # backoff while the database stays busy
+        for attempt in range(self.BUSY_RETRIES + 1):
+            try:
+                with self.pool.connection() as conn:
+                    conn.execute("BEGIN IMMEDIATE")
+                    return write(conn)
+            except sqlite3.OperationalError as e:
+                if not _is_busy(e) or attempt == self.BUSY_RETRIES:
+                    raise
+                time.sleep(self.BUSY_BACKOFF * (2 ** attempt) * random.uniform(0.5, 1.5))
+    
+    def add_orders(self, orders: Iterable[Order], batch_size: Optional[int] = None,
+                   reserve_stock: bool = False) -> List[int]:
+        """Bulk-insert orders, `batch_size` per transaction; returns their ids
+        in input order.
+        
+        With `reserve_stock` each batch checks stock like add_order and an
+        InsufficientStockError rolls back that batch (earlier batches stay
+        committed). Without it stock is decremented unconditionally, as for
+        imports of existing orders.
+        """
+        batch_size = batch_size or self.IMPORT_BATCH_SIZE
+        order_ids: List[int] = []
+        batch: List[Order] = []
+        
+        def flush():
+            order_ids.extend(self._write_immediate(
+                lambda conn: self._insert_orders(conn, batch, reserve_stock)
+            ))
+            self.product_cache.invalidate(item.product_id for order in batch for item in order.items)
+        
+        for order in orders:
+            batch.append(order)
+            if len(batch) >= batch_size:
+                flush()
+                batch = []
+        if batch:
+            flush()
+        return order_ids
     
     def add_order(self, order: Order) -> int:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO orders (client_id, order_date, status)
-                VALUES (?, ?, ?)
-            """, (order.client_id, order.order_date, order.status))
-            order_id = cursor.lastrowid
-            
-            for item in order.items:
-                cursor.execute("""
-                    INSERT INTO order_items (order_id, product_id, quantity, unit_price)
-                    VALUES (?, ?, ?, ?)
-                """, (order_id, item.product_id, item.quantity, item.unit_price))
-                
-                # Update product stock
-                cursor.execute("""
-                    UPDATE products 
-                    SET stock = stock - ?
-                    WHERE id = ?
-                """, (item.quantity, item.product_id))
+        """Save the order and reserve its stock in one write transaction.
+        
+        BEGIN IMMEDIATE takes the write lock before any stock is read, so
+        concurrent checkouts (other threads or workstations sharing the file)
+        serialize instead of overselling. Raises InsufficientStockError if a
+        product cannot cover its quantity; nothing is written in that case.
+        A checkout that still finds the database busy is retried with backoff.
+        """
+        order_id = self._write_immediate(
+            lambda conn: self._insert_orders(conn, [order], reserve_stock=True)[0]
+        )
+        # Stock of the ordered products changed
+        self.product_cache.invalidate(item.product_id for item in order.items)
+        return order_id
+    
+    def _order_filter(
+        self,
+        client_id: Optional[int] = None,
+        status: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> tuple:
+        """Build a WHERE clause over the `orders o` alias from optional filters."""
+        clauses, params = [], []
+        if client_id is not None:
+            clauses.append("o.client_id = ?")
+            params.append(client_id)
+        if status is not None:
+            clauses.append("o.status = ?")
+            params.append(status)
+        if start_date is not None:
+            clauses.append("o.order_date >= ?")
+            params.append(start_date)
+        if end_date is not None:
+            clauses.append("o.order_date <= ?")
+            params.append(end_date)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+    
+    def _load_orders(self, where: str, params: list, order_by: str = "o.id") -> List[Order]:
+        # One LEFT JOIN for headers and items; rows of an order arrive adjacent
+        # because o.id is always part of the sort key.
+        with self.pool.connection() as conn:
+            cursor = conn.execute(f"""
+                SELECT o.id, o.client_id, o.order_date, o.status,
+                       oi.product_id, oi.quantity, oi.unit_price
+                FROM orders o
+                LEFT JOIN order_items oi ON oi.order_id = o.id
+                {where}
+                ORDER BY {order_by}, o.id
+            """, params)
             
-            conn.commit()
-            return order_id
+            orders = []
+            current = None
+            for row in cursor:
+                if current is None or current.id != row[0]:
+                    current = Order.from_row(row[:4])
+                    orders.append(current)
+                if row[4] is not None:
+                    current.items.append(OrderItem.from_row(row[4:]))
+            return orders
     
     def get_order(self, order_id: int) -> Optional[Order]:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Get order details
-            cursor.execute("SELECT * FROM orders WHERE id = ?", (order_id,))
-            order_row = cursor.fetchone()
-            if not order_row:
-                return None
-                
-            order_columns = [desc[0] for desc in cursor.description]
-            order_data = dict(zip(order_columns, order_row))
-            
-            # Get order items
-            cursor.execute("""
-                SELECT product_id, quantity, unit_price 
-                FROM order_items 
-                WHERE order_id = ?
-            """, (order_id,))
-            
-            items = [
-                OrderItem(product_id=row[0], quantity=row[1], unit_price=row[2])
-                for row in cursor.fetchall()
-            ]
-            
-            return Order(
-                id=order_data['id'],
-                client_id=order_data['client_id'],
-                items=items,
-                order_date=order_data['order_date'],
-                status=order_data['status']
-            )
+        orders = self._load_orders("WHERE o.id = ?", [order_id])
+        return orders[0] if orders else None
     
-    def get_all_orders(self) -> List[Order]:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT id FROM orders")
-            order_ids = [row[0] for row in cursor.fetchall()]
-            return [self.get_order(order_id) for order_id in order_ids]
+    def get_all_orders(
+        self,
+        client_id: Optional[int] = None,
+        status: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None
+    ) -> List[Order]:
+        where, params = self._order_filter(client_id, status, start_date, end_date)
+        return self._load_orders(where, params)
+    
+    def _query_order_summaries(
+        self,
+        client_id: Optional[int],
+        status: Optional[str],
+        start_date: Optional[str],
+        end_date: Optional[str],
+        sort_by: str,
+        descending: bool,
+        after: Optional[tuple],
+        limit: Optional[int]
+    ) -> Tuple[List[OrderSummary], Optional[tuple]]:
+        # Headers and client names in one JOIN; totals are the stored columns
+        where, params = self._order_filter(client_id, status, start_date, end_date)
+        sort_expr, condition, keyset_params, order = self._keyset("orders", "o.id", sort_by, descending, after)
+        if condition:
+            where = f"{where} AND {condition}" if where else f"WHERE {condition}"
+            params += keyset_params
+        
+        with self.pool.connection() as conn:
+            rows = conn.execute(f"""
+                SELECT o.id, o.client_id, c.name, o.order_date, o.status,
+                       o.total_amount, o.item_count, {sort_expr}
+                FROM orders o
+                LEFT JOIN clients c ON c.id = o.client_id
+                {where}
+                ORDER BY {order}
+                LIMIT ?
+            """, params + [-1 if limit is None else limit]).fetchall()
+        
+        summaries = [OrderSummary(*row[:7]) for row in rows]
+        next_after = (rows[-1][7], rows[-1][0]) if rows else None
+        return summaries, next_after
+    
+    def get_order_summaries(
+        self,
+        client_id: Optional[int] = None,
+        status: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        sort_by: str = "id",
+        descending: bool = False,
+        after: Optional[tuple] = None,
+        limit: Optional[int] = None
+    ) -> Page:
+        """Rows for the orders table: id, client name, date, status, total and
+        item count from a single query; filtered, sorted and paged like find_orders."""
+        summaries, next_after = self._query_order_summaries(
+            client_id, status, start_date, end_date, sort_by, descending, after, limit
+        )
+        return Page(summaries, next_after)
+    
+    def find_orders(
+        self,
+        client_id: Optional[int] = None,
+        status: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        sort_by: str = "id",
+        descending: bool = False,
+        after: Optional[tuple] = None,
+        limit: Optional[int] = None
+    ) -> Page:
+        """Order headers matching the filters, with their stored totals and
+        item counts; keyset-paged and sorted like get_clients_page."""
+        summaries, next_after = self._query_order_summaries(
+            client_id, status, start_date, end_date, sort_by, descending, after, limit
+        )
+        headers = [
+            OrderHeader(s.id, s.client_id, s.order_date, s.status, s.total_amount, s.item_count)
+            for s in summaries
+        ]
+        return Page(headers, next_after)
     
     def update_order_status(self, order_id: int, status: str):
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 UPDATE orders 
@@ -201,239 +1123,473 @@ class Database:
             """, (status, order_id))
             conn.commit()
     
-    def search_clients(self, search_term: str) -> List[Client]:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM clients 
-                WHERE name LIKE ? OR email LIKE ? OR phone LIKE ?
-            """, (f"%{search_term}%", f"%{search_term}%", f"%{search_term}%"))
+    # Search: terms of three or more characters go through the trigram FTS5
+    # index (substring match, ranked by bm25); shorter terms, or databases
+    # without FTS5, scan the base table with a Unicode-aware casefold().
+    def _search_rows(self, table: str, search_term: str,
+                     limit: Optional[int], prefix: bool) -> Tuple[List[str], List[tuple]]:
+        columns = SEARCH_COLUMNS[table]
+        term = search_term.strip().casefold()
+        sql_limit = -1 if limit is None else limit
+        
+        with self.pool.connection() as conn:
+            # instr(...) = 1 is a prefix match, > 0 a substring match
+            match = "= 1" if prefix else "> 0"
+            if self.fts_enabled and len(term) >= 3:
+                phrase = '"' + term.replace('"', '""') + '"'
+                # The index finds substring matches; the prefix test runs in
+                # SQL too, so LIMIT applies to the final rows. Prefix matches
+                # are listed by id (as without FTS): FTS5 yields rowid order
+                # directly, so the scan stops after `limit` rows instead of
+                # ranking every match first
+                starts, order = "", f"{table}_fts.rank"
+                if prefix:
+                    starts = "AND (" + " OR ".join(f"instr(casefold(t.{c}), ?) = 1" for c in columns) + ")"
+                    order = f"{table}_fts.rowid"
+                cursor = conn.execute(f"""
+                    SELECT t.* FROM {table}_fts
+                    JOIN {table} t ON t.id = {table}_fts.rowid
+                    WHERE {table}_fts MATCH ? {starts}
+                    ORDER BY {order}
+                    LIMIT ?
+                """, (phrase,) + (term,) * (len(columns) if prefix else 0) + (sql_limit,))
+                return [desc[0] for desc in cursor.description], cursor.fetchall()
             
-            columns = [desc[0] for desc in cursor.description]
-            return [self._dict_to_client(dict(zip(columns, row))) for row in cursor.fetchall()]
+            where = " OR ".join(f"instr(casefold({c}), ?) {match}" for c in columns)
+            cursor = conn.execute(f"""
+                SELECT * FROM {table}
+                WHERE {where}
+                ORDER BY id
+                LIMIT ?
+            """, (term,) * len(columns) + (sql_limit,))
+            return [desc[0] for desc in cursor.description], cursor.fetchall()
     
-    def search_products(self, search_term: str) -> List[Product]:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT * FROM products 
-                WHERE name LIKE ? OR category LIKE ?
-            """, (f"%{search_term}%", f"%{search_term}%"))
-            
-            columns = [desc[0] for desc in cursor.description]
-            return [Product(**dict(zip(columns, row))) for row in cursor.fetchall()]
-    
-    def export_to_csv(self, entity_type: str, file_path: str):
-        data = []
-        if entity_type == "clients":
-            data = self.get_all_clients()
-        elif entity_type == "products":
-            data = self.get_all_products()
-        elif entity_type == "orders":
-            data = self.get_all_orders()
-        else:
-            raise ValueError("Invalid entity type")
+    def search_clients(self, search_term: str, limit: Optional[int] = None,
+                       prefix: bool = False) -> List[Client]:
+        """Clients whose name, email or phone contains (or, with `prefix`,
+        starts with) the term, best matches first
+        (prefix matches by id)."""
+        columns, rows = self._search_rows("clients", search_term, limit, prefix)
+        return [self._dict_to_client(dict(zip(columns, row))) for row in rows]
+    
+    def search_products(self, search_term: str, limit: Optional[int] = None,
+                        prefix: bool = False) -> List[Product]:
+        """Products whose name or category contains (or, with `prefix`,
+        starts with) the term, best matches first
+        (prefix matches by id)."""
+        columns, rows = self._search_rows("products", search_term, limit, prefix)
+        return [Product.from_dict(dict(zip(columns, row))) for row in rows]
+    
+    def rebuild_search_index(self):
+        if not self.fts_enabled:
+            return
+        with self.pool.connection() as conn:
+            for table in SEARCH_COLUMNS:
+                conn.execute(f"INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild')")
+    
+    def check_order_totals(self) -> List[Dict]:
+        """Orders whose stored total_amount / item_count disagree with their lines."""
+        with self.pool.connection() as conn:
+            rows = conn.execute("""
+                SELECT o.id, o.total_amount, COALESCE(t.total, 0), o.item_count, COALESCE(t.items, 0)
+                FROM orders o
+                LEFT JOIN (
+                    SELECT order_id, SUM(quantity * unit_price) AS total, COUNT(*) AS items
+                    FROM order_items GROUP BY order_id
+                ) t ON t.order_id = o.id
+                WHERE abs(o.total_amount - COALESCE(t.total, 0)) > 1e-6
+                   OR o.item_count != COALESCE(t.items, 0)
+                ORDER BY o.id
+            """).fetchall()
+        return [
+            {
+                'id': row[0],
+                'stored_total': row[1],
+                'actual_total': row[2],
+                'stored_items': row[3],
+                'actual_items': row[4]
+            }
+            for row in rows
+        ]
+    
+    def rebuild_order_totals(self) -> int:
+        """Recompute every order's stored totals from order_items; returns the
+        number of orders that were out of date."""
+        stale = len(self.check_order_totals())
+        with self.pool.connection() as conn:
+            conn.execute(f"UPDATE orders SET {_ORDER_TOTALS_SET.format(ref='orders.id')}")
+        return stale
+    
+    def check_sales_rollup(self) -> List[Dict]:
+        """Days/statuses whose daily_sales row disagrees with the order tables."""
+        with self.pool.connection() as conn:
+            rows = conn.execute("""
+                WITH actual AS (
+                    SELECT o.order_date AS sale_date, o.status AS status,
+                           COUNT(DISTINCT o.id) AS order_count,
+                           SUM(oi.quantity * oi.unit_price) AS revenue, SUM(oi.quantity) AS units
+                    FROM orders o JOIN order_items oi ON oi.order_id = o.id
+                    GROUP BY o.order_date, o.status
+                ), keys AS (
+                    SELECT sale_date, status FROM daily_sales
+                    UNION
+                    SELECT sale_date, status FROM actual
+                )
+                SELECT k.sale_date, k.status,
+                       COALESCE(s.order_count, 0), COALESCE(a.order_count, 0),
+                       COALESCE(s.revenue, 0), COALESCE(a.revenue, 0),
+                       COALESCE(s.units, 0), COALESCE(a.units, 0)
+                FROM keys k
+                LEFT JOIN daily_sales s ON s.sale_date = k.sale_date AND s.status = k.status
+                LEFT JOIN actual a ON a.sale_date = k.sale_date AND a.status = k.status
+                WHERE COALESCE(s.order_count, 0) != COALESCE(a.order_count, 0)
+                   OR abs(COALESCE(s.revenue, 0) - COALESCE(a.revenue, 0)) > 1e-6
+                   OR COALESCE(s.units, 0) != COALESCE(a.units, 0)
+                ORDER BY k.sale_date, k.status
+            """).fetchall()
+        return [
+            {
+                'date': row[0],
+                'status': row[1],
+                'stored_orders': row[2],
+                'actual_orders': row[3],
+                'stored_revenue': row[4],
+                'actual_revenue': row[5],
+                'stored_units': row[6],
+                'actual_units': row[7]
+            }
+            for row in rows
+        ]
+    
+    def rebuild_sales_rollup(self):
+        """Backfill daily_sales / daily_category_sales from the order tables."""
+        with self.pool.connection() as conn:
+            for statement in _SALES_ROLLUP_BACKFILL:
+                conn.execute(statement)
+    
+    # Streaming export: rows are read through fetchmany batches and written
+    # as they arrive, so memory use does not grow with the table size.
+    EXPORT_COLUMNS = {
+        "clients": ['id', 'name', 'email', 'phone', 'address', 'registration_date', 'is_premium'],
+        "products": ['id', 'name', 'price', 'category', 'stock'],
+        "orders": ['id', 'client_id', 'order_date', 'status', 'items'],
+    }
+    
+    def _iter_rows(self, query: str, params: tuple = (),
+                   batch_size: Optional[int] = None) -> Iterator[tuple]:
+        batch_size = batch_size or self.EXPORT_BATCH_SIZE
+        with self.pool.connection() as conn:
+            cursor = conn.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+    
+    def _iter_export_records(self, entity_type: str,
+                             progress: Optional[Callable[[int], None]] = None) -> Iterator[Dict]:
+        if progress:
+            # Report every EXPORT_BATCH_SIZE records written
+            for count, record in enumerate(self._iter_export_records(entity_type), start=1):
+                yield record
+                if count % self.EXPORT_BATCH_SIZE == 0:
+                    progress(count)
+            return
         
-        if not data:
+        if entity_type in ("clients", "products"):
+            columns = self.EXPORT_COLUMNS[entity_type]
+            query = f"SELECT {', '.join(columns)} FROM {entity_type} ORDER BY id"
+            for row in self._iter_rows(query):
+                yield dict(zip(columns, row))
             return
         
+        # Orders: one ordered JOIN, items of an order arrive on adjacent rows
+        current = None
+        for order_id, client_id, order_date, status, product_id, quantity, unit_price in self._iter_rows("""
+            SELECT o.id, o.client_id, o.order_date, o.status,
+                   oi.product_id, oi.quantity, oi.unit_price
+            FROM orders o
+            LEFT JOIN order_items oi ON oi.order_id = o.id
+            ORDER BY o.id
+        """):
+            if current is None or current['id'] != order_id:
+                if current is not None:
+                    yield current
+                current = {
+                    'id': order_id,
+                    'client_id': client_id,
+                    'order_date': order_date,
+                    'status': status,
+                    'items': []
+                }
+            if product_id is not None:
+                current['items'].append({
+                    'product_id': product_id,
+                    'quantity': quantity,
+                    'unit_price': unit_price
+                })
+        if current is not None:
+            yield current
+    
+    def _check_entity_type(self, entity_type: str):
+        if entity_type not in self.EXPORT_COLUMNS:
+            raise ValueError("Invalid entity type")
+    
+    def export_to_csv(self, entity_type: str, file_path: str,
+                      progress: Optional[Callable[[int], None]] = None):
+        self._check_entity_type(entity_type)
+        columns = self.EXPORT_COLUMNS[entity_type]
+        
         with open(file_path, 'w', newline='', encoding='utf-8') as f:
-            if entity_type == "orders":
-                # Special handling for orders with nested items
-                writer = csv.writer(f)
-                writer.writerow(['id', 'client_id', 'order_date', 'status', 'items'])
-                for order in data:
-                    items_str = ";".join(
-                        f"{item.product_id}:{item.quantity}:{item.unit_price}"
-                        for item in order.items
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for record in self._iter_export_records(entity_type, progress):
+                if entity_type == "orders":
+                    # Nested items are flattened to "product_id:quantity:unit_price;..."
+                    record['items'] = ";".join(
+                        f"{item['product_id']}:{item['quantity']}:{item['unit_price']}"
+                        for item in record['items']
                     )
-                    writer.writerow([
-                        order.id, order.client_id, order.order_date, 
-                        order.status, items_str
-                    ])
-            else:
-                writer = csv.DictWriter(f, fieldnames=vars(data[0]).keys())
-                writer.writeheader()
-                for item in data:
-                    writer.writerow(vars(item))
+                writer.writerow([record[column] for column in columns])
     
-    def import_from_csv(self, entity_type: str, file_path: str):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            
-            if entity_type == "clients":
-                for row in reader:
-                    try:
-                        client_data = {
-                            'name': row['name'],
-                            'email': row['email'],
-                            'phone': row['phone'],
-                            'address': row['address'],
-                            'registration_date': row.get('registration_date', datetime.now().strftime("%Y-%m-%d"))
-                        }
-                        if row.get('is_premium') == '1':
-                            client = PremiumClient(**client_data)
-                        else:
-                            client = Client(**client_data)
-                        self.add_client(client)
-                    except Exception as e:
-                        print(f"Error importing client: {e}")
-            
-            elif entity_type == "products":
-                for row in reader:
-                    try:
-                        product = Product(
-                            id=int(row['id']),
-                            name=row['name'],
-                            price=float(row['price']),
-                            category=row['category'],
-                            stock=int(row.get('stock', 0))
-                        )
-                        self.add_product(product)
-                    except Exception as e:
-                        print(f"Error importing product: {e}")
+    def export_to_json(self, entity_type: str, file_path: str, lines: bool = False,
+                       progress: Optional[Callable[[int], None]] = None):
+        """Export as a JSON array (same layout as json.dump with indent=2),
+        or as JSON Lines with one compact record per line when `lines` is set."""
+        self._check_entity_type(entity_type)
+        
+        with open(file_path, 'w', encoding='utf-8') as f:
+            records = self._iter_export_records(entity_type, progress)
+            if lines:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False))
+                    f.write("\n")
+                return
             
-            elif entity_type == "orders":
-                for row in reader:
-                    try:
-                        order = Order(
-                            id=int(row['id']),
-                            client_id=int(row['client_id']),
-                            order_date=row['order_date'],
-                            status=row['status'])
-                        
-                        # Parse items
-                        items_str = row.get('items', '')
-                        if items_str:
-                            for item_str in items_str.split(';'):
-                                if ':' in item_str:
-                                    product_id, quantity, unit_price = item_str.split(':')
-                                    order.items.append(OrderItem(
-                                        product_id=int(product_id),
-                                        quantity=int(quantity),
-                                        unit_price=float(unit_price)
-                                    ))
-                        
-                        self.add_order(order)
-                    except Exception as e:
-                        print(f"Error importing order: {e}")
-    
-    def export_to_json(self, entity_type: str, file_path: str):
-        data = []
-        if entity_type == "clients":
-            data = [vars(client) for client in self.get_all_clients()]
-        elif entity_type == "products":
-            data = [vars(product) for product in self.get_all_products()]
-        elif entity_type == "orders":
-            data = []
-            for order in self.get_all_orders():
-                order_dict = {
-                    'id': order.id,
-                    'client_id': order.client_id,
-                    'order_date': order.order_date,
-                    'status': order.status,
-                    'items': [
-                        {
-                            'product_id': item.product_id,
-                            'quantity': item.quantity,
-                            'unit_price': item.unit_price
-                        }
-                        for item in order.items
-                    ]
-                }
-                data.append(order_dict)
-        else:
+            separator = "[\n"
+            for record in records:
+                f.write(separator)
+                encoded = json.dumps(record, indent=2, ensure_ascii=False)
+                f.write("  " + encoded.replace("\n", "\n  "))
+                separator = ",\n"
+            f.write("\n]" if separator != "[\n" else "[]")
+    
+    # Bulk import: records are validated through the model classes and
+    # inserted with executemany, one transaction per IMPORT_BATCH_SIZE rows.
+    def _client_from_record(self, record: Dict) -> Client:
+        client_data = {
+            'id': int(record.get('id') or 0),
+            'name': record['name'],
+            'email': record['email'],
+            'phone': record['phone'],
+            'address': record['address'],
+            'registration_date': record.get('registration_date') or datetime.now().strftime("%Y-%m-%d")
+        }
+        if str(record.get('is_premium', '')).strip().lower() in ('1', 'true'):
+            return PremiumClient(**client_data)
+        return Client(**client_data)
+    
+    def _product_from_record(self, record: Dict) -> Product:
+        return Product(
+            id=int(record.get('id') or 0),
+            name=record['name'],
+            price=float(record['price']),
+            category=record['category'],
+            stock=int(record.get('stock') or 0)
+        )
+    
+    def _order_from_record(self, record: Dict) -> Order:
+        order = Order(
+            id=int(record.get('id') or 0),
+            client_id=int(record['client_id']),
+            order_date=record['order_date'],
+            status=record['status']
+        )
+        
+        items = record.get('items') or []
+        if isinstance(items, str):
+            # CSV format: "product_id:quantity:unit_price;..."
+            items = [
+                dict(zip(('product_id', 'quantity', 'unit_price'), item_str.split(':')))
+                for item_str in items.split(';') if ':' in item_str
+            ]
+        for item in items:
+            order.items.append(OrderItem(
+                product_id=int(item['product_id']),
+                quantity=int(item['quantity']),
+                unit_price=float(item['unit_price'])
+            ))
+        return order
+    
+    def _import_handlers(self, entity_type: str) -> tuple:
+        handlers = {
+            "clients": (self._client_from_record, self._insert_clients),
+            "products": (self._product_from_record, self._insert_products),
+            "orders": (self._order_from_record, self._insert_orders),
+        }
+        if entity_type not in handlers:
             raise ValueError("Invalid entity type")
+        return handlers[entity_type]
+    
+    def _invalidate_imported(self, entity_type: str, entities: List[Any]):
+        # New clients and products cannot be cached yet; imported orders
+        # change the stock of their products
+        if entity_type == "orders":
+            self.product_cache.invalidate(
+                item.product_id for order in entities for item in order.items
+            )
+    
+    def _replay_import_batch(self, conn: sqlite3.Connection, insert,
+                             batch: List[Tuple[int, Any]]) -> Tuple[int, List[RowError]]:
+        # Each row under a savepoint, so only the offending rows are dropped.
+        # Returns the outcome instead of recording it, so a busy retry of the
+        # whole transaction cannot count rows twice.
+        imported, errors = 0, []
+        for row_number, entity in batch:
+            conn.execute("SAVEPOINT import_row")
+            try:
+                insert(conn, [entity])
+            except sqlite3.Error as e:
+                conn.execute("ROLLBACK TO import_row")
+                errors.append(RowError(row_number, str(e)))
+            else:
+                imported += 1
+            conn.execute("RELEASE import_row")
+        return imported, errors
+    
+    def _write_import_batch(self, entity_type: str, insert, batch: List[Tuple[int, Any]],
+                            result: ImportResult):
+        entities = [entity for _, entity in batch]
+        try:
+            try:
+                self._write_immediate(lambda conn: insert(conn, entities))
+                result.imported += len(batch)
+            except sqlite3.IntegrityError:
+                # A constraint failed somewhere in the chunk: replay it row by row
+                imported, errors = self._write_immediate(
+                    lambda conn: self._replay_import_batch(conn, insert, batch)
+                )
+                result.imported += imported
+                result.errors.extend(errors)
+        finally:
+            self._invalidate_imported(entity_type, entities)
+    
+    def _bulk_import(self, entity_type: str, records: Iterable[Tuple[int, Any]],
+                     batch_size: Optional[int] = None,
+                     progress: Optional[Callable[[int], None]] = None,
+                     decode: Optional[Callable[[Any], Dict]] = None) -> ImportResult:
+        """`records` yields (row number, record) pairs; with `decode` each raw
+        record is decoded first, so a malformed one becomes a RowError too.
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        `progress` is called with the number of records processed after each
+        committed batch; an exception raised from it stops the import, leaving
+        the batches written so far in place."""
+        parse, insert = self._import_handlers(entity_type)
+        batch_size = batch_size or self.IMPORT_BATCH_SIZE
+        result = ImportResult(entity_type)
+        
+        batch = []
+        for row_number, record in records:
+            try:
+                batch.append((row_number, parse(decode(record) if decode else record)))
+            except (ValidationError, KeyError, ValueError, TypeError, AttributeError) as e:
+                message = f"missing field {e}" if isinstance(e, KeyError) else str(e)
+                result.errors.append(RowError(row_number, message))
+                continue
+            if len(batch) >= batch_size:
+                self._write_import_batch(entity_type, insert, batch, result)
+                batch = []
+                if progress:
+                    progress(row_number)
+        if batch:
+            self._write_import_batch(entity_type, insert, batch, result)
+        
+        result.errors.sort(key=lambda e: e.row)
+        if result.imported:
+            self.analyze()
+        return result
     
-    def import_from_json(self, entity_type: str, file_path: str):
+    def import_from_csv(self, entity_type: str, file_path: str,
+                        batch_size: Optional[int] = None,
+                        progress: Optional[Callable[[int], None]] = None) -> ImportResult:
+        self._import_handlers(entity_type)
         with open(file_path, 'r', encoding='utf-8') as f:
+            return self._bulk_import(entity_type, enumerate(csv.DictReader(f), start=1),
+                                     batch_size, progress)
+    
+    def import_from_json(self, entity_type: str, file_path: str,
+                         batch_size: Optional[int] = None, lines: bool = False,
+                         progress: Optional[Callable[[int], None]] = None) -> ImportResult:
+        self._import_handlers(entity_type)
+        with open(file_path, 'r', encoding='utf-8') as f:
+            if lines:
+                # JSON Lines are parsed lazily, one record per non-empty line;
+                # errors are reported by line number
+                lines = ((number, line) for number, line in enumerate(f, start=1) if line.strip())
+                return self._bulk_import(entity_type, lines, batch_size, progress, decode=json.loads)
             data = json.load(f)
-            
-            if entity_type == "clients":
-                for item in data:
-                    try:
-                        # ИСПРАВЛЕННЫЙ КОД: проверяем is_premium вместо discount_rate
-                        if item.get('is_premium', False):
-                            client = PremiumClient(
-                                id=item['id'],
-                                name=item['name'],
-                                email=item['email'],
-                                phone=item['phone'],
-                                address=item['address'],
-                                registration_date=item.get('registration_date', datetime.now().strftime("%Y-%m-%d"))
-                            )
-                        else:
-                            client = Client(
-                                id=item['id'],
-                                name=item['name'],
-                                email=item['email'],
-                                phone=item['phone'],
-                                address=item['address'],
-                                registration_date=item.get('registration_date', datetime.now().strftime("%Y-%m-%d"))
-                            )
-                        self.add_client(client)
-                    except Exception as e:
-                        print(f"Error importing client: {e}")
-            
-            elif entity_type == "products":
-                for item in data:
-                    try:
-                        product = Product(
-                            id=item['id'],
-                            name=item['name'],
-                            price=item['price'],
-                            category=item['category'],
-                            stock=item['stock']
-                        )
-                        self.add_product(product)
-                    except Exception as e:
-                        print(f"Error importing product: {e}")
-            
-            elif entity_type == "orders":
-                for item in data:
-                    try:
-                        order = Order(
-                            id=item['id'],
-                            client_id=item['client_id'],
-                            order_date=item['order_date'],
-                            status=item['status'],
-                            items=[]
-                        )
-                        
-                        for order_item in item.get('items', []):
-                            order.items.append(OrderItem(
-                                product_id=order_item['product_id'],
-                                quantity=order_item['quantity'],
-                                unit_price=order_item['unit_price']
-                            ))
-                        
-                        self.add_order(order)
-                    except Exception as e:
-                        print(f"Error importing order: {e}")
-    
-    def get_orders_by_date_range(self, start_date: str, end_date: str) -> List[Order]:
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id FROM orders 
-                WHERE order_date BETWEEN ? AND ?
-                ORDER BY order_date
-            """, (start_date, end_date))
-            
-            order_ids = [row[0] for row in cursor.fetchall()]
-            return [self.get_order(order_id) for order_id in order_ids]
+        return self._bulk_import(entity_type, enumerate(data, start=1), batch_size, progress)
+    
+    def get_orders_by_date_range(
+        self,
+        start_date: str,
+        end_date: str,
+        client_id: Optional[int] = None,
+        status: Optional[str] = None
+    ) -> List[Order]:
+        where, params = self._order_filter(client_id, status, start_date, end_date)
+        return self._load_orders(where, params, order_by="o.order_date")
+    
+    # Tables and columns of get_order_item_columns: name -> array typecode,
+    # None for text columns
+    ANALYTICS_COLUMNS = {
+        "orders": {'id': 'q', 'client_id': 'q', 'order_date': None, 'status': None},
+        "order_items": {'order_id': 'q', 'product_id': 'q', 'quantity': 'q', 'unit_price': 'd'},
+        "products": {'id': 'q', 'category': None},
+    }
+    
+    def _fetch_columns(self, conn: sqlite3.Connection, table: str, alias: str,
+                       where: str, params: list) -> Dict[str, Any]:
+        spec = self.ANALYTICS_COLUMNS[table]
+        columns = {name: array(typecode) if typecode else [] for name, typecode in spec.items()}
+        select = ", ".join(f"{alias}.{name}" for name in spec)
+        cursor = conn.execute(f"SELECT {select} FROM {table} {alias} {where}", params)
+        while True:
+            batch = cursor.fetchmany(self.EXPORT_BATCH_SIZE)
+            if not batch:
+                break
+            # Transpose the batch and append each column in one call
+            for name, values in zip(spec, zip(*batch)):
+                columns[name] = _extend_column(columns[name], values)
+        return columns
+    
+    def get_order_item_columns(self, start_date: Optional[str] = None,
+                               end_date: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+        """Column data for line-level analytics: the orders in the period,
+        their order_items and the product categories (ANALYTICS_COLUMNS).
+        
+        Tables come back unjoined, so text such as dates and categories is
+        fetched once per order or product rather than once per line; the
+        caller joins them by id. Numeric columns are typed array.array
+        buffers that NumPy wraps without copying
+        (np.frombuffer(col, dtype=col.typecode)); text columns are lists.
+        """
+        where, params = self._order_filter(start_date=start_date, end_date=end_date)
+        item_where = f"WHERE oi.order_id IN (SELECT o.id FROM orders o {where})" if where else ""
+        with self.pool.connection() as conn:
+            return {
+                "orders": self._fetch_columns(conn, "orders", "o", where, params),
+                "order_items": self._fetch_columns(conn, "order_items", "oi", item_where, params),
+                "products": self._fetch_columns(conn, "products", "p", "", []),
+            }
     
     def get_top_clients(self, limit: int = 5) -> List[Dict]:
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
-                SELECT c.id, c.name, COUNT(o.id) as order_count, SUM(oi.quantity * oi.unit_price) as total_spent
+                SELECT c.id, c.name, COUNT(o.id) as order_count, SUM(o.total_amount) as total_spent
                 FROM clients c
                 LEFT JOIN orders o ON c.id = o.client_id
-                LEFT JOIN order_items oi ON o.id = oi.order_id
                 GROUP BY c.id, c.name
                 ORDER BY order_count DESC, total_spent DESC
                 LIMIT ?
@@ -449,31 +1605,108 @@ class Database:
                 for row in cursor.fetchall()
             ]
     
-    def get_sales_by_date(self) -> List[Dict]:
-        with sqlite3.connect(self.db_path) as conn:
+    def _date_range(self, start_date: Optional[str], end_date: Optional[str]) -> tuple:
+        clauses, params = [], []
+        if start_date is not None:
+            clauses.append("sale_date >= ?")
+            params.append(start_date)
+        if end_date is not None:
+            clauses.append("sale_date <= ?")
+            params.append(end_date)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+    
+    def get_sales_by_date(self, start_date: Optional[str] = None,
+                          end_date: Optional[str] = None) -> List[Dict]:
+        # Read from the daily_sales rollup: one row per day and status
+        where, params = self._date_range(start_date, end_date)
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
+            cursor.execute(f"""
                 SELECT 
-                    order_date,
-                    COUNT(DISTINCT o.id) as order_count,
-                    SUM(oi.quantity * oi.unit_price) as total_amount
-                FROM orders o
-                JOIN order_items oi ON o.id = oi.order_id
-                GROUP BY order_date
-                ORDER BY order_date
-            """)
+                    sale_date,
+                    SUM(order_count) as order_count,
+                    SUM(revenue) as total_amount,
+                    SUM(units) as units
+                FROM daily_sales
+                {where}
+                GROUP BY sale_date
+                HAVING SUM(order_count) > 0
+                ORDER BY sale_date
+            """, params)
             
             return [
                 {
                     'date': row[0],
                     'order_count': row[1],
-                    'total_amount': row[2] if row[2] else 0
+                    'total_amount': row[2] if row[2] else 0,
+                    'units': row[3] if row[3] else 0
                 }
                 for row in cursor.fetchall()
             ]
     
+    def get_sales_by_category(self, start_date: Optional[str] = None,
+                              end_date: Optional[str] = None) -> List[Dict]:
+        where, params = self._date_range(start_date, end_date)
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                SELECT category, SUM(revenue) as revenue, SUM(units) as units
+                FROM daily_category_sales
+                {where}
+                GROUP BY category
+                HAVING SUM(units) > 0
+                ORDER BY revenue DESC
+            """, params)
+            
+            return [
+                {
+                    'category': row[0],
+                    'revenue': row[1] if row[1] else 0,
+                    'units': row[2] if row[2] else 0
+                }
+                for row in cursor.fetchall()
+            ]
+    
+    def get_sales_summary(self, start_date: Optional[str] = None,
+                          end_date: Optional[str] = None, top_n: int = 5) -> Optional[Dict]:
+        """Order count, revenue, average order value and the top_n products
+        by revenue for orders in the period; None if there are none."""
+        where, params = self._order_filter(start_date=start_date, end_date=end_date)
+        with self.pool.connection() as conn:
+            # Totals come from the stored orders.total_amount, no lines needed
+            total_orders, total_revenue = conn.execute(f"""
+                SELECT COUNT(*), COALESCE(SUM(o.total_amount), 0)
+                FROM orders o
+                {where}
+            """, params).fetchone()
+            if not total_orders:
+                return None
+            
+            top_products = conn.execute(f"""
+                SELECT oi.product_id,
+                       SUM(oi.quantity) as quantity,
+                       SUM(oi.quantity * oi.unit_price) as revenue
+                FROM orders o
+                JOIN order_items oi ON oi.order_id = o.id
+                {where}
+                GROUP BY oi.product_id
+                ORDER BY revenue DESC
+                LIMIT ?
+            """, params + [top_n]).fetchall()
+        
+        return {
+            'total_orders': total_orders,
+            'total_revenue': total_revenue,
+            'avg_order_value': total_revenue / total_orders,
+            'top_products': [
+                {'product_id': row[0], 'quantity': row[1], 'revenue': row[2]}
+                for row in top_products
+            ],
+        }
+    
     def get_product_sales(self) -> List[Dict]:
-        with sqlite3.connect(self.db_path) as conn:
+        with self.pool.connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT 
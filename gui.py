@@ -2,10 +2,12 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
 from typing import Optional, List, Dict
-from db import Database
-from analysis import DataAnalyzer
+from db import Database, ProductIndex, SEARCH_COLUMNS
+from analysis import DataAnalyzer, load_dependencies
 from models import Client, Product, Order, ValidationError, PremiumClient
-import sqlite3
+from tasks import BackgroundRunner
+from widgets import PagedTable, IncrementalSearch
+
 class ShopApp:
     def __init__(self, root):
         self.root = root
@@ -16,6 +18,17 @@ class ShopApp:
         self.db = Database()
         self.analyzer = DataAnalyzer(self.db)
         
+        # Tab id -> loader for tabs not populated yet; each runs on first show
+        self.tab_loaders = {}
+        self.prefetch_pending = False
+        
+        # Product ids/names for order entry; reloaded on product writes
+        self.product_index = ProductIndex([])
+        
+        # Database and analytics jobs run on worker threads
+        self.tasks = BackgroundRunner(root)
+        self.create_status_bar()
+        
         # Create notebook for tabs
         self.notebook = ttk.Notebook(root)
         self.notebook.pack(fill=tk.BOTH, expand=True)
@@ -27,14 +40,88 @@ class ShopApp:
         self.create_reports_tab()
         self.create_import_export_tab()
         
-        # Load initial data
-        self.refresh_clients_list()
-        self.refresh_products_list()
-        self.refresh_orders_list()
+        # Load the visible tab now; the rest are prefetched once it is done
+        # (on_task_activity) or loaded when first selected
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed)
+        self.prefetch_pending = True
+        if not self.load_tab(self.notebook.select()):
+            self.prefetch_tabs()
+    
+    def load_tab(self, tab_id) -> bool:
+        loader = self.tab_loaders.pop(str(tab_id), None)
+        if loader is None:
+            return False
+        loader()
+        return True
+    
+    def on_tab_changed(self, event=None):
+        self.load_tab(self.notebook.select())
+    
+    def prefetch_tabs(self):
+        self.prefetch_pending = False
+        for tab_id in list(self.tab_loaders):
+            self.load_tab(tab_id)
+    
+    def close(self):
+        self.tasks.shutdown()
+        self.db.close()
+    
+    def create_status_bar(self):
+        status_frame = ttk.Frame(self.root, padding=(10, 2))
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X)
+        
+        self.status_label = ttk.Label(status_frame, text="Готово")
+        self.status_label.pack(side=tk.LEFT)
+        
+        self.status_cancel_button = ttk.Button(
+            status_frame, 
+            text="Отмена", 
+            command=self.tasks.cancel_all,
+            state=tk.DISABLED
+        )
+        self.status_cancel_button.pack(side=tk.RIGHT)
+        
+        self.status_progress = ttk.Progressbar(status_frame, mode="indeterminate", length=200)
+        self.status_progress.pack(side=tk.RIGHT, padx=5)
+        
+        self.tasks.on_activity = self.on_task_activity
+        self.tasks.on_progress = self.on_task_progress
+    
+    def on_task_activity(self, task):
+        if task is None:
+            self.status_progress.stop()
+            self.status_label.config(text="Готово")
+            self.status_cancel_button.config(state=tk.DISABLED)
+            if self.prefetch_pending:
+                self.prefetch_tabs()
+            return
+        
+        self.status_progress.start(10)
+        self.status_label.config(text=f"{task.description}...")
+        # Only imports and exports stop early; writes always run to the end
+        self.status_cancel_button.config(state=tk.NORMAL if self.tasks.can_cancel else tk.DISABLED)
+    
+    def on_task_progress(self, task, done, total):
+        text = f"{task.description}: {done}" + (f" из {total}" if total else "")
+        self.status_label.config(text=text)
+    
+    def run_in_background(self, func, on_done=None, description="Загрузка", key=None,
+                          pass_task=False, error_message="Ошибка"):
+        """Run func on a worker thread and call on_done(result) on the Tk thread."""
+        def on_error(error):
+            if isinstance(error, ValidationError):
+                messagebox.showerror("Ошибка валидации", str(error))
+            else:
+                messagebox.showerror("Ошибка", f"{error_message}: {str(error)}")
+        
+        return self.tasks.submit(
+            func, on_done, on_error, key=key, description=description, pass_task=pass_task
+        )
     
     def create_clients_tab(self):
         tab = ttk.Frame(self.notebook)
         self.notebook.add(tab, text="Клиенты")
+        self.tab_loaders[str(tab)] = self.refresh_clients_list
         
         # Client list frame
         list_frame = ttk.LabelFrame(tab, text="Список клиентов", padding=10)
@@ -47,9 +134,10 @@ class ShopApp:
         ttk.Label(search_frame, text="Поиск:").pack(side=tk.LEFT)
         self.client_search_entry = ttk.Entry(search_frame)
         self.client_search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
-        self.client_search_entry.bind("<KeyRelease>", self.on_client_search)
         
         ttk.Button(search_frame, text="Очистить", command=self.clear_client_search).pack(side=tk.LEFT)
+        client_more_button = ttk.Button(search_frame, text="Показать еще")
+        client_more_button.pack(side=tk.LEFT, padx=5)
         
         # Client list treeview
         self.clients_tree = ttk.Treeview(
@@ -75,10 +163,24 @@ class ShopApp:
         self.clients_tree.column("premium", width=80)
         
         scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.clients_tree.yview)
-        self.clients_tree.configure(yscrollcommand=scrollbar.set)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.clients_tree.pack(fill=tk.BOTH, expand=True)
         
+        # Rows are fetched page by page while scrolling
+        self.clients_table = PagedTable(
+            self.clients_tree, scrollbar, self.tasks,
+            fetch_page=self.db.get_clients_page,
+            to_values=self.client_values,
+            sort_keys={"reg_date": "registration_date", "premium": "is_premium"},
+            key="clients_list", description="Загрузка клиентов"
+        )
+        self.client_search = IncrementalSearch(
+            self.client_search_entry, self.clients_table, client_more_button,
+            search=lambda term, limit: self.db.search_clients(term, limit=limit),
+            columns=SEARCH_COLUMNS["clients"],
+            description="Поиск клиентов"
+        )
+        
         # Client details frame
         detail_frame = ttk.LabelFrame(tab, text="Данные клиента", padding=10)
         detail_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -146,6 +248,7 @@ class ShopApp:
     def create_products_tab(self):
         tab = ttk.Frame(self.notebook)
         self.notebook.add(tab, text="Товары")
+        self.tab_loaders[str(tab)] = self.refresh_products_list
         
         # Product list frame
         list_frame = ttk.LabelFrame(tab, text="Список товаров", padding=10)
@@ -158,9 +261,10 @@ class ShopApp:
         ttk.Label(search_frame, text="Поиск:").pack(side=tk.LEFT)
         self.product_search_entry = ttk.Entry(search_frame)
         self.product_search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
-        self.product_search_entry.bind("<KeyRelease>", self.on_product_search)
         
         ttk.Button(search_frame, text="Очистить", command=self.clear_product_search).pack(side=tk.LEFT)
+        product_more_button = ttk.Button(search_frame, text="Показать еще")
+        product_more_button.pack(side=tk.LEFT, padx=5)
         
         # Product list treeview
         self.products_tree = ttk.Treeview(
@@ -182,10 +286,23 @@ class ShopApp:
         self.products_tree.column("stock", width=80)
         
         scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.products_tree.yview)
-        self.products_tree.configure(yscrollcommand=scrollbar.set)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.products_tree.pack(fill=tk.BOTH, expand=True)
         
+        # Rows are fetched page by page while scrolling
+        self.products_table = PagedTable(
+            self.products_tree, scrollbar, self.tasks,
+            fetch_page=self.db.get_products_page,
+            to_values=self.product_values,
+            key="products_list", description="Загрузка товаров"
+        )
+        self.product_search = IncrementalSearch(
+            self.product_search_entry, self.products_table, product_more_button,
+            search=lambda term, limit: self.db.search_products(term, limit=limit),
+            columns=SEARCH_COLUMNS["products"],
+            description="Поиск товаров"
+        )
+        
         # Product details frame
         detail_frame = ttk.LabelFrame(tab, text="Данные товара", padding=10)
         detail_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -246,6 +363,7 @@ class ShopApp:
     def create_orders_tab(self):
         tab = ttk.Frame(self.notebook)
         self.notebook.add(tab, text="Заказы")
+        self.tab_loaders[str(tab)] = self.load_orders_tab
         
         # Order list frame
         list_frame = ttk.LabelFrame(tab, text="Список заказов", padding=10)
@@ -272,6 +390,8 @@ class ShopApp:
         
         ttk.Button(filter_frame, text="Очистить", command=self.clear_order_filter).pack(side=tk.LEFT)
         
+        self.order_filter = self.current_order_filter()
+        
         # Order list treeview
         self.orders_tree = ttk.Treeview(
             list_frame,
@@ -280,7 +400,9 @@ class ShopApp:
         )
         
         self.orders_tree.heading("id", text="ID", command=lambda: self.sort_orders("id"))
-        self.orders_tree.heading("client", text="Клиент", command=lambda: self.sort_orders("client"))
+        # No sorting by client: names live in another table, so ORDER BY
+        # could not use an index and every page would sort all orders
+        self.orders_tree.heading("client", text="Клиент")
         self.orders_tree.heading("date", text="Дата", command=lambda: self.sort_orders("date"))
         self.orders_tree.heading("status", text="Статус", command=lambda: self.sort_orders("status"))
         self.orders_tree.heading("amount", text="Сумма", command=lambda: self.sort_orders("amount"))
@@ -294,10 +416,21 @@ class ShopApp:
         self.orders_tree.column("items", width=200)
         
         scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.orders_tree.yview)
-        self.orders_tree.configure(yscrollcommand=scrollbar.set)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.orders_tree.pack(fill=tk.BOTH, expand=True)
         
+        # Rows are fetched page by page while scrolling
+        self.orders_table = PagedTable(
+            self.orders_tree, scrollbar, self.tasks,
+            fetch_page=self.load_order_rows,
+            to_values=tuple,
+            sort_keys={
+                "date": "order_date",
+                "amount": "total_amount", "items": "item_count"
+            },
+            key="orders_list", description="Загрузка заказов"
+        )
+        
         # Order details frame
         detail_frame = ttk.LabelFrame(tab, text="Детали заказа", padding=10)
         detail_frame.pack(fill=tk.X, padx=10, pady=5)
@@ -409,8 +542,9 @@ class ShopApp:
         
         # Bind treeview selection
         self.orders_tree.bind("<<TreeviewSelect>>", self.on_order_select)
-        
-        # Initialize comboboxes
+    
+    def load_orders_tab(self):
+        self.refresh_orders_list()
         self.update_client_comboboxes()
         self.update_product_comboboxes()
     
@@ -492,7 +626,7 @@ class ShopApp:
         ttk.Label(export_frame, text="Формат:").grid(row=1, column=0, sticky=tk.W, padx=5, pady=2)
         self.export_format = ttk.Combobox(
             export_frame, 
-            values=["CSV", "JSON"],
+            values=["CSV", "JSON", "JSONL"],
             state="readonly"
         )
         self.export_format.current(0)
@@ -522,7 +656,7 @@ class ShopApp:
         ttk.Label(import_frame, text="Формат:").grid(row=1, column=0, sticky=tk.W, padx=5, pady=2)
         self.import_format = ttk.Combobox(
             import_frame, 
-            values=["CSV", "JSON"],
+            values=["CSV", "JSON", "JSONL"],
             state="readonly"
         )
         self.import_format.current(0)
@@ -538,45 +672,29 @@ class ShopApp:
     
     # Client methods
     def refresh_clients_list(self):
-        self.clients_tree.delete(*self.clients_tree.get_children())
-        clients = self.db.get_all_clients()
-        for client in clients:
-            self.clients_tree.insert("", tk.END, values=(
-                client.id,
-                client.name,
-                client.email,
-                client.phone,
-                client.address,
-                client.registration_date,
-                "Да" if isinstance(client, PremiumClient) else "Нет"
-            ))
+        # Keeps an active search applied
+        self.client_search.refresh()
     
-    def on_client_search(self, event):
-        search_term = self.client_search_entry.get()
-        if not search_term:
-            self.refresh_clients_list()
-            return
-        
-        self.clients_tree.delete(*self.clients_tree.get_children())
-        clients = self.db.search_clients(search_term)
-        for client in clients:
-            self.clients_tree.insert("", tk.END, values=(
-                client.id,
-                client.name,
-                client.email,
-                client.phone,
-                client.address,
-                client.registration_date,
-                "Да" if isinstance(client, PremiumClient) else "Нет"
-            ))
+    def client_values(self, client):
+        return (
+            client.id,
+            client.name,
+            client.email,
+            client.phone,
+            client.address,
+            client.registration_date,
+            "Да" if isinstance(client, PremiumClient) else "Нет"
+        )
     
     def clear_client_search(self):
         self.client_search_entry.delete(0, tk.END)
         self.refresh_clients_list()
     
     def sort_clients(self, column):
-        # This is a simplified sorting - in a real app you'd implement proper sorting
-        self.refresh_clients_list()
+        # Sorting is done by the database (ORDER BY column, id) page by page
+        self.client_search_entry.delete(0, tk.END)
+        self.client_search.clear()
+        self.clients_table.sort(column)
     
     def on_client_select(self, event):
         selected = self.clients_tree.focus()
@@ -631,11 +749,16 @@ class ShopApp:
                     address=address
                 )
             
-            self.db.add_client(client)
-            self.refresh_clients_list()
-            self.clear_client_form()
-            self.update_client_comboboxes()
-            messagebox.showinfo("Успех", "Клиент добавлен успешно")
+            def on_added(client_id):
+                self.refresh_clients_list()
+                self.clear_client_form()
+                self.update_client_comboboxes()
+                messagebox.showinfo("Успех", "Клиент добавлен успешно")
+            
+            self.run_in_background(
+                lambda: self.db.add_client(client), on_added,
+                "Сохранение клиента", error_message="Не удалось добавить клиента"
+            )
         except ValidationError as e:
             messagebox.showerror("Ошибка валидации", str(e))
         except Exception as e:
@@ -679,67 +802,42 @@ class ShopApp:
 
         client_id = self.clients_tree.item(selected, 'values')[0]
         if messagebox.askyesno("Confirm", f"Delete client {client_id}?"):
-            try:
-                # РЕАЛЬНОЕ УДАЛЕНИЕ ИЗ БАЗЫ ДАННЫХ
-                with sqlite3.connect(self.db.db_path) as conn:
-                    cursor = conn.cursor()
-                    # Сначала удаляем связанные заказы и элементы заказов
-                    cursor.execute("SELECT id FROM orders WHERE client_id = ?", (client_id,))
-                    order_ids = [row[0] for row in cursor.fetchall()]
-
-                    for order_id in order_ids:
-                        cursor.execute("DELETE FROM order_items WHERE order_id = ?", (order_id,))
-
-                    cursor.execute("DELETE FROM orders WHERE client_id = ?", (client_id,))
-                    # Затем удаляем самого клиента
-                    cursor.execute("DELETE FROM clients WHERE id = ?", (client_id,))
-                    conn.commit()
-
+            def on_deleted(_):
                 # ОБНОВЛЯЕМ ИНТЕРФЕЙС
                 self.refresh_clients_list()
+                self.refresh_orders_list()
                 self.clear_client_form()
                 self.update_client_comboboxes()
                 messagebox.showinfo("Success", f"Client {client_id} deleted successfully")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to delete client: {str(e)}")
+            
+            # РЕАЛЬНОЕ УДАЛЕНИЕ ИЗ БАЗЫ ДАННЫХ (вместе с заказами клиента)
+            self.run_in_background(
+                lambda: self.db.delete_client(client_id), on_deleted,
+                "Удаление клиента", error_message="Failed to delete client"
+            )
     
     # Product methods
     def refresh_products_list(self):
-        self.products_tree.delete(*self.products_tree.get_children())
-        products = self.db.get_all_products()
-        for product in products:
-            self.products_tree.insert("", tk.END, values=(
-                product.id,
-                product.name,
-                f"{product.price}₽",
-                product.category,
-                product.stock
-            ))
+        self.product_search.refresh()
     
-    def on_product_search(self, event):
-        search_term = self.product_search_entry.get()
-        if not search_term:
-            self.refresh_products_list()
-            return
-        
-        self.products_tree.delete(*self.products_tree.get_children())
-        products = self.db.search_products(search_term)
-        for product in products:
-            self.products_tree.insert("", tk.END, values=(
-                product.id,
-                product.name,
-                f"{product.price}₽",
-                product.category,
-                product.stock
-            ))
+    def product_values(self, product):
+        return (
+            product.id,
+            product.name,
+            f"{product.price}₽",
+            product.category,
+            product.stock
+        )
     
     def clear_product_search(self):
         self.product_search_entry.delete(0, tk.END)
         self.refresh_products_list()
     
     def sort_products(self, column):
-        # This is a simplified sorting - in a real app you'd implement proper sorting
-        self.refresh_products_list()
+        # Sorting is done by the database (ORDER BY column, id) page by page
+        self.product_search_entry.delete(0, tk.END)
+        self.product_search.clear()
+        self.products_table.sort(column)
     
     def on_product_select(self, event):
         selected = self.products_tree.focus()
@@ -782,11 +880,16 @@ class ShopApp:
                 stock=stock
             )
             
-            self.db.add_product(product)
-            self.refresh_products_list()
-            self.clear_product_form()
-            self.update_product_comboboxes()
-            messagebox.showinfo("Успех", "Товар добавлен успешно")
+            def on_added(product_id):
+                self.refresh_products_list()
+                self.clear_product_form()
+                self.update_product_comboboxes()
+                messagebox.showinfo("Успех", "Товар добавлен успешно")
+            
+            self.run_in_background(
+                lambda: self.db.add_product(product), on_added,
+                "Сохранение товара", error_message="Не удалось добавить товар"
+            )
         except ValueError:
             messagebox.showerror("Ошибка", "Неверное числовое значение")
         except ValidationError as e:
@@ -833,60 +936,69 @@ class ShopApp:
 
         product_id = self.products_tree.item(selected, 'values')[0]
         if messagebox.askyesno("Confirm", f"Delete product {product_id}?"):
-            try:
-                # РЕАЛЬНОЕ УДАЛЕНИЕ ИЗ БАЗЫ ДАННЫХ
-                with sqlite3.connect(self.db.db_path) as conn:
-                    cursor = conn.cursor()
-                    # Удаляем связанные элементы заказов
-                    cursor.execute("DELETE FROM order_items WHERE product_id = ?", (product_id,))
-                    # Затем удаляем сам товар
-                    cursor.execute("DELETE FROM products WHERE id = ?", (product_id,))
-                    conn.commit()
-
+            def on_deleted(_):
                 # ОБНОВЛЯЕМ ИНТЕРФЕЙС
                 self.refresh_products_list()
+                self.refresh_orders_list()
                 self.clear_product_form()
                 self.update_product_comboboxes()
                 messagebox.showinfo("Success", f"Product {product_id} deleted successfully")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to delete product: {str(e)}")
+            
+            # РЕАЛЬНОЕ УДАЛЕНИЕ ИЗ БАЗЫ ДАННЫХ (вместе с позициями заказов)
+            self.run_in_background(
+                lambda: self.db.delete_product(product_id), on_deleted,
+                "Удаление товара", error_message="Failed to delete product"
+            )
     
     # Order methods
     def refresh_orders_list(self):
-        self.orders_tree.delete(*self.orders_tree.get_children())
-        orders = self.db.get_all_orders()
-        for order in orders:
-            client = self.db.get_client(order.client_id)
-            client_name = client.name if client else f"Клиент {order.client_id}"
-            
-            item_count = len(order.items)
-            total_amount = order.total_amount
-            
-            self.orders_tree.insert("", tk.END, values=(
+        self.orders_table.reload()
+    
+    def current_order_filter(self):
+        # Comboboxes hold "id: name" for clients; "Все" or empty means no filter
+        client_filter = self.order_client_filter.get()
+        status_filter = self.order_status_filter.get()
+        
+        client_id = None
+        if client_filter and client_filter != "Все":
+            client_id = int(client_filter.split(':')[0].strip())
+        status = status_filter if status_filter and status_filter != "Все" else None
+        return {'client_id': client_id, 'status': status}
+    
+    def load_order_rows(self, after, limit, sort_by, descending):
+        # Runs on a worker thread: only database access, no widgets
+        # One query per page: client names and totals come from the same JOIN
+        page = self.db.get_order_summaries(
+            sort_by=sort_by, descending=descending, after=after, limit=limit,
+            **self.order_filter
+        )
+        rows = [
+            (
                 order.id,
-                client_name,
+                order.client_name or f"Клиент {order.client_id}",
                 order.order_date,
                 order.status.capitalize(),
-                f"{total_amount}₽",
-                f"{item_count} товаров"
-            ))
+                f"{order.total_amount}₽",
+                f"{order.item_count} товаров"
+            )
+            for order in page.rows
+        ]
+        return page._replace(rows=rows)
     
     def on_order_filter(self, event):
-        client_filter = self.order_client_filter.get()
-        status_filter = self.order_status_filter.get()
-        
-        # In a real app, we would filter orders based on these criteria
-        # For this example, we'll just refresh the list
+        # Filtering happens in SQL; the table pages through matching orders only
+        self.order_filter = self.current_order_filter()
         self.refresh_orders_list()
     
     def clear_order_filter(self):
         self.order_client_filter.set('')
         self.order_status_filter.current(0)
+        self.order_filter = self.current_order_filter()
         self.refresh_orders_list()
     
     def sort_orders(self, column):
-        # This is a simplified sorting - in a real app you'd implement proper sorting
-        self.refresh_orders_list()
+        # Sorting is done by the database (ORDER BY column, id) page by page
+        self.orders_table.sort(column)
     
     def on_order_select(self, event):
         selected = self.orders_tree.focus()
@@ -894,9 +1006,25 @@ class ShopApp:
             return
         
         order_id = self.orders_tree.item(selected, 'values')[0]
-        order = self.db.get_order(order_id)
-        if not order:
+        
+        def load():
+            order = self.db.get_order(order_id)
+            if not order:
+                return None
+            products = self.db.get_products_by_ids(item.product_id for item in order.items)
+            names = {
+                item.product_id: products[item.product_id].name if item.product_id in products
+                else f"Товар {item.product_id}"
+                for item in order.items
+            }
+            return order, names
+        
+        self.run_in_background(load, self.show_order_details, "Загрузка заказа", key="order_details")
+    
+    def show_order_details(self, loaded):
+        if not loaded:
             return
+        order, product_names = loaded
         
         self.clear_order_form()
         
@@ -909,10 +1037,10 @@ class ShopApp:
         # Add items to the items tree
         self.order_items_tree.delete(*self.order_items_tree.get_children())
         for item in order.items:
-            product = self.db.get_product(item.product_id)
-            product_name = product.name if product else f"Товар {item.product_id}"
+            product_name = product_names[item.product_id]
             
-            self.order_items_tree.insert("", tk.END, values=(
+            # Items are keyed by product id, so order entry never resolves names
+            self.order_items_tree.insert("", tk.END, iid=str(item.product_id), values=(
                 product_name,
                 f"{item.unit_price}₽",
                 item.quantity,
@@ -947,22 +1075,42 @@ class ShopApp:
             if quantity <= 0:
                 raise ValueError("Quantity must be positive")
 
-            product = self.db.get_product(product_id)
+        except ValueError as e:
+            messagebox.showerror("Error", f"Invalid input: {str(e)}")
+            return
+
+        self.run_in_background(
+            lambda: self.db.get_product(product_id),
+            lambda product: self.insert_order_item(product, quantity),
+            "Проверка товара", error_message="Failed to add item"
+        )
+
+    def insert_order_item(self, product, quantity):
+        try:
             if not product:
                 messagebox.showerror("Error", "Selected product not found")
                 return
 
+            # Строки заказа привязаны к id товара; повторный выбор товара
+            # увеличивает количество в существующей строке
+            item_id = str(product.id)
+            if self.order_items_tree.exists(item_id):
+                quantity += int(self.order_items_tree.item(item_id, 'values')[2])
+
             if product.stock < quantity:
                 messagebox.showerror("Error", f"Insufficient stock. Available: {product.stock}")
                 return
 
-            # Добавляем в дерево items
-            self.order_items_tree.insert("", tk.END, values=(
+            values = (
                 product.name,
                 f"{product.price:.2f} Р",
                 quantity,
                 f"{product.price * quantity:.2f} Р"
-            ))
+            )
+            if self.order_items_tree.exists(item_id):
+                self.order_items_tree.item(item_id, values=values)
+            else:
+                self.order_items_tree.insert("", tk.END, iid=item_id, values=values)
 
             # Обновляем общую сумму - ПРОСТОЙ И НАДЕЖНЫЙ СПОСОБ
             # Пересчитываем всю сумму заново из всех items
@@ -979,8 +1127,6 @@ class ShopApp:
             self.order_quantity_entry.delete(0, tk.END)
             self.order_quantity_entry.insert(0, "1")
 
-        except ValueError as e:
-            messagebox.showerror("Error", f"Invalid input: {str(e)}")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to add item: {str(e)}")
 
@@ -994,26 +1140,13 @@ class ShopApp:
             # Парсим ID клиента из комбобокса (формат: "id: name")
             client_id = int(client_selection.split(':')[0].strip())
 
-            items = []
+            # (product id, quantity); item iids are product ids
+            lines = []
             for child in self.order_items_tree.get_children():
                 values = self.order_items_tree.item(child, 'values')
-                product_name = values[0]
-                quantity = int(values[2])
-
-                # Ищем товар по имени
-                product = None
-                for p in self.db.get_all_products():
-                    if p.name == product_name:
-                        product = p
-                        break
-
-                if not product:
-                    messagebox.showerror("Error", f"Product '{product_name}' not found")
-                    return
-
-                items.append((product, quantity))
+                lines.append((int(child), int(values[2])))
 
-            if not items:
+            if not lines:
                 messagebox.showerror("Error", "Order must have at least one item")
                 return
 
@@ -1023,19 +1156,31 @@ class ShopApp:
                 order_date=self.order_date_entry.get(),
                 status=self.order_status_combobox.get()
             )
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to create order: {str(e)}")
+            return
+
+        product_index = self.product_index
+
+        def save():
+            # Runs on a worker thread: all products in one lookup
+            products = self.db.get_products_by_ids(product_id for product_id, _ in lines)
+            for product_id, quantity in lines:
+                product = products.get(product_id)
+                if not product:
+                    raise ValidationError(f"Product '{product_index.name(product_id)}' not found")
 
-            for product, quantity in items:
                 order.add_item(product, quantity)
 
-            self.db.add_order(order)
+            return self.db.add_order(order)
+
+        def on_created(order_id):
             self.refresh_orders_list()
+            self.products_table.reload()  # stock was reserved
             self.clear_order_form()
             messagebox.showinfo("Success", "Order created successfully")
 
-        except ValidationError as e:
-            messagebox.showerror("Validation Error", str(e))
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to create order: {str(e)}")
+        self.run_in_background(save, on_created, "Создание заказа", error_message="Failed to create order")
     
     def update_order(self):
         selected = self.orders_tree.focus()
@@ -1073,20 +1218,45 @@ class ShopApp:
                 messagebox.showerror("Ошибка", f"Не удалось удалить заказ: {str(e)}")
     
     # Report methods
+    # Data is loaded on a worker thread; matplotlib draws on the Tk thread
+    def run_report(self, load, plot, description):
+        def prepare():
+            # Runs on a worker thread: the first report imports the plotting
+            # libraries here instead of freezing the window
+            load_dependencies()
+            return load()
+        
+        self.run_in_background(
+            prepare, plot, description, key="report",
+            error_message="Не удалось построить отчет"
+        )
+    
     def show_top_clients(self):
-        self.analyzer.plot_top_clients()
+        self.run_report(
+            self.analyzer.load_top_clients,
+            lambda data: self.analyzer.plot_top_clients(top_clients=data),
+            "Топ клиентов"
+        )
     
     def show_sales_trend(self):
-        self.analyzer.plot_sales_trend()
+        self.run_report(self.analyzer.load_sales_trend, self.analyzer.plot_sales_trend, "Динамика продаж")
     
     def show_top_products(self):
-        self.analyzer.plot_top_products()
+        self.run_report(
+            self.analyzer.load_product_sales,
+            lambda data: self.analyzer.plot_top_products(product_sales=data),
+            "Топ товаров"
+        )
     
     def show_category_distribution(self):
-        self.analyzer.plot_product_category_distribution()
+        self.run_report(
+            self.analyzer.load_product_sales,
+            self.analyzer.plot_product_category_distribution,
+            "Распределение по категориям"
+        )
     
     def show_client_network(self):
-        self.analyzer.plot_client_network()
+        self.run_report(self.analyzer.load_client_network, self.analyzer.plot_client_network, "Сеть клиентов")
     
     def generate_sales_report(self):
         start_date = self.report_start_date.get()
@@ -1099,7 +1269,11 @@ class ShopApp:
             messagebox.showerror("Ошибка", "Неверный формат даты. Используйте ГГГГ-ММ-ДД")
             return
         
-        self.analyzer.generate_sales_report(start_date, end_date)
+        self.run_report(
+            lambda: self.analyzer.build_sales_report(start_date, end_date),
+            lambda report: self.analyzer.show_sales_report(start_date, end_date, report),
+            "Отчет о продажах"
+        )
     
     # Import/Export methods
     def export_data(self):
@@ -1122,15 +1296,21 @@ class ShopApp:
         if not file_path:
             return
         
-        try:
+        def export(task):
+            progress = task.report_progress
             if file_format == "csv":
-                self.db.export_to_csv(entity_type, file_path)
-            elif file_format == "json":
-                self.db.export_to_json(entity_type, file_path)
-            
-            messagebox.showinfo("Успех", f"Данные успешно экспортированы в {file_path}")
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось экспортировать данные: {str(e)}")
+                self.db.export_to_csv(entity_type, file_path, progress=progress)
+            elif file_format in ("json", "jsonl"):
+                self.db.export_to_json(
+                    entity_type, file_path, lines=file_format == "jsonl", progress=progress
+                )
+        
+        self.run_in_background(
+            export,
+            lambda _: messagebox.showinfo("Успех", f"Данные успешно экспортированы в {file_path}"),
+            f"Экспорт {entity_type}", pass_task=True,
+            error_message="Не удалось экспортировать данные"
+        )
     
     def import_data(self):
         entity_type = self.import_type.get()
@@ -1151,12 +1331,16 @@ class ShopApp:
         if not file_path:
             return
         
-        try:
+        def run_import(task):
+            # Progress reports double as cancellation points between batches
+            progress = task.report_progress
             if file_format == "csv":
-                self.db.import_from_csv(entity_type, file_path)
-            elif file_format == "json":
-                self.db.import_from_json(entity_type, file_path)
-            
+                return self.db.import_from_csv(entity_type, file_path, progress=progress)
+            return self.db.import_from_json(
+                entity_type, file_path, lines=file_format == "jsonl", progress=progress
+            )
+        
+        def on_imported(result):
             # Refresh all views
             self.refresh_clients_list()
             self.refresh_products_list()
@@ -1164,13 +1348,36 @@ class ShopApp:
             self.update_client_comboboxes()
             self.update_product_comboboxes()
             
-            messagebox.showinfo("Успех", f"Данные успешно импортированы из {file_path}")
-        except Exception as e:
-            messagebox.showerror("Ошибка", f"Не удалось импортировать данные: {str(e)}")
+            self.show_import_result(result, file_path)
+        
+        self.run_in_background(
+            run_import, on_imported, f"Импорт {entity_type}", pass_task=True,
+            error_message="Не удалось импортировать данные"
+        )
+    
+    def show_import_result(self, result, file_path):
+        message = f"Импортировано записей: {result.imported} из {file_path}"
+        if not result.errors:
+            messagebox.showinfo("Успех", message)
+            return
+        
+        # Показываем только первые ошибки, чтобы окно оставалось читаемым
+        details = "\n".join(f"Строка {e.row}: {e.message}" for e in result.errors[:10])
+        if result.failed > 10:
+            details += f"\n... и еще {result.failed - 10}"
+        messagebox.showwarning(
+            "Импорт завершен с ошибками",
+            f"{message}\nОшибок: {result.failed}\n\n{details}"
+        )
     
     # Utility methods
     def update_client_comboboxes(self):
-        clients = self.db.get_all_clients()
+        self.run_in_background(
+            self.db.get_all_clients, self.fill_client_comboboxes,
+            "Загрузка клиентов", key="client_options"
+        )
+    
+    def fill_client_comboboxes(self, clients):
         client_options = [(client.id, client.name) for client in clients]
         
         # Update order client combobox
@@ -1180,9 +1387,17 @@ class ShopApp:
         self.order_client_filter['values'] = ["Все"] + [f"{id}: {name}" for id, name in client_options]
 
     def update_product_comboboxes(self):
-        products = self.db.get_all_products()
+        # Rebuilds the product index as well; called after every product write
+        self.run_in_background(
+            self.db.get_product_index, self.fill_product_comboboxes,
+            "Загрузка товаров", key="product_options"
+        )
+    
+    def fill_product_comboboxes(self, product_index):
+        self.product_index = product_index
+        
         # Формат: "id: name"
-        product_options = [f"{product.id}: {product.name}" for product in products]
+        product_options = [f"{product_id}: {name}" for product_id, name in product_index.names.items()]
 
         # Обновляем комбобокс товаров в заказе
         self.order_product_combobox['values'] = product_options
\ No newline at end of file
@@ -1,10 +1,58 @@
+import time
+
+_started = time.perf_counter()
+
+import os
+import sys
+import threading
 import tkinter as tk
 from gui import ShopApp
+from analysis import load_dependencies
+
+# SHOP_STARTUP_TIMING=1 prints how long each startup stage took;
+# SHOP_PREWARM_REPORTS=0 disables loading the report libraries in the background
+STARTUP_TIMING = os.environ.get("SHOP_STARTUP_TIMING", "") not in ("", "0")
+PREWARM_REPORTS = os.environ.get("SHOP_PREWARM_REPORTS", "1") != "0"
+
+class StartupTimer:
+    def __init__(self, enabled: bool, started: float):
+        self.enabled = enabled
+        self.started = started
+
+    def mark(self, stage: str, since: float = None):
+        if not self.enabled:
+            return
+        elapsed = time.perf_counter() - (self.started if since is None else since)
+        print(f"[запуск] {stage}: {elapsed * 1000:.0f} мс", file=sys.stderr)
+
+def prewarm_reports(timer: StartupTimer):
+    # Import the plotting libraries while the user looks at the first tab
+    def run():
+        started = time.perf_counter()
+        try:
+            load_dependencies()
+        except ImportError:
+            return  # the report itself will show the error
+        timer.mark("библиотеки отчетов загружены", since=started)
+
+    threading.Thread(target=run, name="report-prewarm", daemon=True).start()
 
 def main():
+    timer = StartupTimer(STARTUP_TIMING, _started)
+    timer.mark("импорт модулей")
+
     root = tk.Tk()
     app = ShopApp(root)
+    timer.mark("создание интерфейса")
+
+    def on_shown():
+        timer.mark("окно показано")
+        if PREWARM_REPORTS:
+            prewarm_reports(timer)
+
+    root.after(0, on_shown)
     root.mainloop()
+    app.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
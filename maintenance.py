@@ -0,0 +1,57 @@
+import argparse
+import sys
+from db import Database
+
+def check_totals(db: Database) -> int:
+    mismatches = db.check_order_totals()
+    for row in mismatches:
+        print(
+            f"Заказ {row['id']}: сумма {row['stored_total']} (должна быть {row['actual_total']}), "
+            f"позиций {row['stored_items']} (должно быть {row['actual_items']})"
+        )
+    print(f"Расхождений: {len(mismatches)}")
+    return 1 if mismatches else 0
+
+def rebuild_totals(db: Database) -> int:
+    fixed = db.rebuild_order_totals()
+    print(f"Итоги заказов пересчитаны, исправлено заказов: {fixed}")
+    return 0
+
+def check_sales(db: Database) -> int:
+    mismatches = db.check_sales_rollup()
+    for row in mismatches:
+        print(
+            f"{row['date']} ({row['status']}): заказов {row['stored_orders']} "
+            f"(должно быть {row['actual_orders']}), выручка {row['stored_revenue']} "
+            f"(должна быть {row['actual_revenue']}), единиц {row['stored_units']} "
+            f"(должно быть {row['actual_units']})"
+        )
+    print(f"Расхождений: {len(mismatches)}")
+    return 1 if mismatches else 0
+
+def rebuild_sales(db: Database) -> int:
+    db.rebuild_sales_rollup()
+    print("Сводные таблицы продаж по дням пересчитаны")
+    return 0
+
+COMMANDS = {
+    "check-totals": check_totals,
+    "rebuild-totals": rebuild_totals,
+    "check-sales": check_sales,
+    "rebuild-sales": rebuild_sales,
+}
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Обслуживание базы данных магазина")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    parser.add_argument("--db", default="shop.db", help="путь к файлу базы данных")
+    args = parser.parse_args(argv)
+
+    db = Database(args.db)
+    try:
+        return COMMANDS[args.command](db)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,43 @@
 import re
 from datetime import datetime
-from dataclasses import dataclass, field
-from typing import List, Dict, Optional
+from dataclasses import dataclass, field, fields
+from typing import List, Dict, Optional, Sequence
 
 class ValidationError(Exception):
     pass
 
-@dataclass
-class Product:
+class InsufficientStockError(ValidationError):
+    def __init__(self, product_id: int, requested: int, available: Optional[int]):
+        self.product_id = product_id
+        self.requested = requested
+        self.available = available
+        if available is None:
+            super().__init__(f"Product {product_id} not found")
+        else:
+            super().__init__(
+                f"Insufficient stock for product {product_id}: "
+                f"requested {requested}, available {available}"
+            )
+
+class BaseEntity:
+    # Models are slotted dataclasses (no per-instance __dict__), which keeps
+    # bulk loads of orders and items compact; see bench_models.py
+    __slots__ = ()
+    
+    def to_dict(self) -> Dict:
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+    
+    @classmethod
+    def from_dict(cls, data: Dict):
+        return cls(**data)
+    
+    @classmethod
+    def from_row(cls, row: Sequence):
+        """Build from a database row whose columns follow the field order."""
+        return cls(*row)
+
+@dataclass(slots=True)
+class Product(BaseEntity):
     id: int
     name: str
     price: float
@@ -20,8 +50,8 @@ class Product:
         if not self.name.strip():
             raise ValidationError("Product name cannot be empty")
 
-@dataclass
-class Client:
+@dataclass(slots=True)
+class Client(BaseEntity):
     id: int
     name: str
     email: str
@@ -42,9 +72,26 @@ class Client:
     def _validate_phone(self) -> bool:
         pattern = r'^\+?[1-9]\d{1,14}$'  # E.164 format
         return re.match(pattern, self.phone) is not None
+    
+    def to_dict(self) -> Dict:
+        data = BaseEntity.to_dict(self)
+        data['is_premium'] = isinstance(self, PremiumClient)
+        return data
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'Client':
+        data = dict(data)
+        client_class = PremiumClient if data.pop('is_premium', False) else Client
+        return client_class(**data)
+    
+    @classmethod
+    def from_row(cls, row: Sequence) -> 'Client':
+        """Row of the clients table: the fields, then is_premium."""
+        *values, is_premium = row
+        return (PremiumClient if is_premium else Client)(*values)
 
-@dataclass
-class OrderItem:
+@dataclass(slots=True)
+class OrderItem(BaseEntity):
     product_id: int
     quantity: int
     unit_price: float
@@ -53,8 +100,8 @@ class OrderItem:
     def total_price(self) -> float:
         return self.quantity * self.unit_price
 
-@dataclass
-class Order:
+@dataclass(slots=True)
+class Order(BaseEntity):
     id: int
     client_id: int
     items: List[OrderItem] = field(default_factory=list)
@@ -77,16 +124,27 @@ class Order:
             unit_price=product.price
         ))
         product.stock -= quantity
-
-class BaseEntity:
+    
     def to_dict(self) -> Dict:
-        return self.__dict__
+        data = BaseEntity.to_dict(self)
+        data['items'] = [item.to_dict() for item in self.items]
+        return data
     
     @classmethod
-    def from_dict(cls, data: Dict):
+    def from_dict(cls, data: Dict) -> 'Order':
+        data = dict(data)
+        data['items'] = [OrderItem.from_dict(item) for item in data.get('items', [])]
         return cls(**data)
+    
+    @classmethod
+    def from_row(cls, row: Sequence) -> 'Order':
+        """Row of the orders table: id, client_id, order_date, status."""
+        order_id, client_id, order_date, status = row[:4]
+        return cls(id=order_id, client_id=client_id, order_date=order_date, status=status)
 
 class PremiumClient(Client):
+    __slots__ = ('discount_rate',)
+    
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.discount_rate = 0.1  # 10% discount for premium clients
@@ -0,0 +1,199 @@
+import queue
+import threading
+import tkinter as tk
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+class TaskCancelled(Exception):
+    """Raised inside a job to abandon it after Task.cancel()."""
+
+class Task:
+    def __init__(self, runner: 'BackgroundRunner', func: Callable, description: str,
+                 on_done: Optional[Callable], on_error: Optional[Callable],
+                 key: Optional[str], pass_task: bool, on_cancel: Optional[Callable] = None):
+        self.runner = runner
+        self.func = func
+        self.description = description
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_cancel = on_cancel
+        self.key = key
+        self.pass_task = pass_task
+        self.future = None
+        self._cancel_event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    @property
+    def cancellable(self) -> bool:
+        # Only jobs that receive the task can check for cancellation; others
+        # (database writes) run to completion once started
+        return self.pass_task
+
+    def cancel(self):
+        if self.cancelled:
+            return
+        self._cancel_event.set()
+        # A job that never started (still queued, or waiting behind its key)
+        # produces no result; report it ourselves
+        if self.future is None or self.future.cancel():
+            self.runner._results.put(('cancelled', self, None))
+
+    def check_cancelled(self):
+        if self.cancelled:
+            raise TaskCancelled(self.description)
+
+    def report_progress(self, done: int, total: Optional[int] = None):
+        """Called from the worker; delivered to the Tk thread by the runner.
+
+        Doubles as a cancellation point for long jobs.
+        """
+        self.check_cancelled()
+        self.runner._results.put(('progress', self, (done, total)))
+
+    def _run(self):
+        if self.cancelled:
+            self.runner._results.put(('cancelled', self, None))
+            return
+        try:
+            result = self.func(self) if self.pass_task else self.func()
+        except TaskCancelled:
+            self.runner._results.put(('cancelled', self, None))
+        except Exception as e:
+            self.runner._results.put(('error', self, e))
+        else:
+            self.runner._results.put(('done', self, result))
+
+class BackgroundRunner:
+    """Runs database and analytics jobs off the Tk main thread.
+
+    Jobs execute on a small thread pool; their results, errors and progress
+    reports go through a queue that the Tk thread drains with root.after, so
+    callbacks always run on the main thread and may touch widgets.
+
+    Jobs submitted with a key are coalesced: while one is in flight, further
+    submissions with the same key replace each other, and only the latest
+    runs once the current one finishes (its stale result is dropped).
+
+    Every job ends in exactly one callback on the Tk thread: on_done,
+    on_error, or on_cancel when it was cancelled or its result superseded.
+    """
+
+    def __init__(self, root, max_workers: int = 2, poll_interval: int = 50):
+        self.root = root
+        self.poll_interval = poll_interval
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="shop-worker")
+        self._results = queue.Queue()
+        self._in_flight: Dict[str, Task] = {}
+        self._pending: Dict[str, Task] = {}
+        self._active: List[Task] = []
+        self._closed = False
+
+        # Status listeners, called on the Tk thread
+        self.on_progress: Optional[Callable[[Task, int, Optional[int]], None]] = None
+        self.on_activity: Optional[Callable[[Optional[Task]], None]] = None
+
+        self._after_id = self.root.after(self.poll_interval, self._poll)
+
+    def submit(self, func: Callable, on_done: Optional[Callable] = None,
+               on_error: Optional[Callable] = None, key: Optional[str] = None,
+               description: str = "", pass_task: bool = False,
+               on_cancel: Optional[Callable] = None) -> Task:
+        """Schedule func() (or func(task) with pass_task) on a worker thread."""
+        task = Task(self, func, description, on_done, on_error, key, pass_task, on_cancel)
+        if key is not None and key in self._in_flight:
+            superseded = self._pending.get(key)
+            if superseded is not None:
+                superseded.cancel()
+            self._pending[key] = task
+            return task
+        self._start(task)
+        return task
+
+    def _start(self, task: Task):
+        if task.key is not None:
+            self._in_flight[task.key] = task
+        self._active.append(task)
+        task.future = self._executor.submit(task._run)
+        self._notify_activity()
+
+    @property
+    def busy(self) -> bool:
+        return bool(self._active)
+
+    def current_task(self) -> Optional[Task]:
+        # Most recently started job still running, for the status bar
+        running = [t for t in self._active if not t.cancelled]
+        return running[-1] if running else None
+
+    @property
+    def can_cancel(self) -> bool:
+        return any(t.cancellable and not t.cancelled for t in self._tasks())
+
+    def _tasks(self) -> List[Task]:
+        return list(self._active) + list(self._pending.values())
+
+    def cancel_all(self):
+        """Cancel the jobs that can stop early (submitted with pass_task).
+
+        Other jobs keep running and still deliver their callbacks, so a
+        committed write is never reported as if it had not happened.
+        """
+        for task in self._tasks():
+            if task.cancellable:
+                task.cancel()
+        self._notify_activity()
+
+    def _finish(self, task: Task):
+        if task in self._active:
+            self._active.remove(task)
+        if task.key is not None and self._in_flight.get(task.key) is task:
+            del self._in_flight[task.key]
+            pending = self._pending.pop(task.key, None)
+            if pending is not None and not pending.cancelled:
+                self._start(pending)
+        self._notify_activity()
+
+    def _notify_activity(self):
+        if self.on_activity:
+            self.on_activity(self.current_task())
+
+    def _poll(self):
+        try:
+            while True:
+                kind, task, payload = self._results.get_nowait()
+                if kind == 'progress':
+                    if self.on_progress and not task.cancelled:
+                        self.on_progress(task, *payload)
+                    continue
+
+                superseded = task.key is not None and task.key in self._pending
+                self._finish(task)
+                if task.cancelled or superseded or kind == 'cancelled':
+                    if task.on_cancel:
+                        task.on_cancel()
+                    continue
+                if kind == 'done' and task.on_done:
+                    task.on_done(payload)
+                elif kind == 'error':
+                    if task.on_error:
+                        task.on_error(payload)
+                    else:
+                        raise payload
+        except queue.Empty:
+            pass
+        finally:
+            if not self._closed:
+                self._after_id = self.root.after(self.poll_interval, self._poll)
+
+    def shutdown(self):
+        self._closed = True
+        for task in self._tasks():
+            task.cancel()
+        try:
+            self.root.after_cancel(self._after_id)
+        except tk.TclError:
+            pass  # the window is already destroyed
+        self._executor.shutdown(wait=True, cancel_futures=True)
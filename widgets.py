@@ -0,0 +1,238 @@
+import tkinter as tk
+from tkinter import messagebox
+from typing import Any, Callable, Dict, List, Optional
+from db import Page
+from tasks import BackgroundRunner
+
+class PagedTable:
+    """Loads a ttk.Treeview page by page as the user scrolls.
+
+    `fetch_page(after, limit, sort_by, descending)` runs on a worker thread
+    and returns a db.Page with the rows following the keyset cursor `after`
+    (None for the first page) in the requested order. `to_values(row)` turns
+    a row into Treeview values on the Tk thread.
+
+    `sort_keys` maps Treeview column ids to the sort keys understood by
+    fetch_page; clicking the same column again reverses the order.
+    """
+
+    LOAD_THRESHOLD = 0.9   # fetch the next page when the view passes 90% of loaded rows
+
+    def __init__(self, tree, scrollbar, runner: BackgroundRunner,
+                 fetch_page: Callable[[Any, int, str, bool], Page],
+                 to_values: Callable[[Any], tuple],
+                 sort_keys: Optional[Dict[str, str]] = None,
+                 key: str = "", description: str = "Загрузка", page_size: int = 200):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.runner = runner
+        self.fetch_page = fetch_page
+        self.to_values = to_values
+        self.sort_keys = sort_keys or {}
+        self.key = key or f"page:{id(self)}"
+        self.description = description
+        self.page_size = page_size
+
+        self._cursor = None
+        self._exhausted = True
+        self._loading = False
+        self._generation = 0
+
+        self.sort_column = "id"
+        self.descending = False
+        self._headings = {column: tree.heading(column, 'text') for column in tree['columns']}
+
+        self.tree.configure(yscrollcommand=self._on_scroll)
+
+    def sort(self, column: str):
+        """Order by a Treeview column (toggling direction on repeat) and reload."""
+        if column == self.sort_column:
+            self.descending = not self.descending
+        else:
+            self.sort_column = column
+            self.descending = False
+
+        for name, text in self._headings.items():
+            arrow = (" ▼" if self.descending else " ▲") if name == column else ""
+            self.tree.heading(name, text=text + arrow)
+        self.reload()
+
+    def reload(self):
+        """Drop the loaded rows and fetch the first page."""
+        self._cursor = None
+        self._exhausted = False
+        self._request(first=True)
+
+    def show_rows(self, rows: List[Any]):
+        """Display a complete, already fetched result (e.g. search results)."""
+        self._loading = False
+        self._exhausted = True
+        self._fill(rows, first=True)
+
+    def load_more(self):
+        if self._loading or self._exhausted:
+            return
+        self._request(first=False)
+
+    def _request(self, first: bool):
+        self._loading = True
+        self._generation += 1
+        generation = self._generation
+        after = self._cursor
+        sort_by = self.sort_keys.get(self.sort_column, self.sort_column)
+        descending = self.descending
+        self.runner.submit(
+            lambda: self.fetch_page(after, self.page_size, sort_by, descending),
+            lambda page: self._on_page(page, first),
+            on_error=self._on_error,
+            on_cancel=lambda: self._on_cancel(generation),
+            key=self.key,
+            description=self.description
+        )
+
+    def _on_cancel(self, generation: int):
+        # Only the latest request owns _loading; an older one being dropped
+        # must not let a duplicate page load start
+        if generation == self._generation:
+            self._loading = False
+
+    def _on_page(self, page, first: bool):
+        self._loading = False
+        if len(page.rows) < self.page_size:
+            self._exhausted = True
+        if page.rows:
+            self._cursor = page.next_after
+        self._fill(page.rows, first)
+
+    def _on_error(self, error: Exception):
+        self._loading = False
+        self._exhausted = True
+        messagebox.showerror("Ошибка", f"Не удалось загрузить данные: {str(error)}")
+
+    def _fill(self, rows: List[Any], first: bool):
+        if first:
+            self.tree.delete(*self.tree.get_children())
+            self.tree.yview_moveto(0)
+        for row in rows:
+            self.tree.insert("", "end", values=self.to_values(row))
+
+    def _on_scroll(self, first: str, last: str):
+        self.scrollbar.set(first, last)
+        if float(last) >= self.LOAD_THRESHOLD:
+            self.load_more()
+
+class IncrementalSearch:
+    """Debounced search box feeding a PagedTable.
+
+    The query runs once typing pauses for DELAY_MS; results of superseded
+    queries are dropped. When every match of the previous term is loaded
+    and the new term contains it, the new matches are a subset and are
+    filtered in memory instead of querying again. At most `limit` rows are
+    shown; `more_button` raises the limit by another `limit`.
+
+    `search(term, limit)` runs on a worker thread and returns up to `limit`
+    entities; `columns` are the entity attributes it matches against
+    (case-insensitive substring), used for the in-memory refinement. With
+    an empty search box the table shows its regular paged listing.
+    """
+
+    DELAY_MS = 300
+
+    def __init__(self, entry, table: PagedTable, more_button,
+                 search: Callable[[str, int], List[Any]], columns: tuple,
+                 limit: int = 100, description: str = "Поиск"):
+        self.entry = entry
+        self.table = table
+        self.more_button = more_button
+        self.search = search
+        self.columns = columns
+        self.limit = limit
+        self.description = description
+
+        self._after_id = None
+        self._generation = 0
+        self._reset()
+
+        self.entry.bind("<KeyRelease>", self.schedule)
+        self.more_button.config(command=self.show_more, state=tk.DISABLED)
+
+    def _reset(self):
+        self._term = ""
+        self._rows: List[Any] = []
+        self._complete = False
+        self._shown = self.limit
+
+    def schedule(self, event=None):
+        if self._after_id is not None:
+            self.entry.after_cancel(self._after_id)
+        self._after_id = self.entry.after(self.DELAY_MS, self.run)
+
+    def clear(self):
+        """Forget the current search (pending and in-flight queries included)."""
+        if self._after_id is not None:
+            self.entry.after_cancel(self._after_id)
+            self._after_id = None
+        self._generation += 1
+        self._reset()
+        self.more_button.config(state=tk.DISABLED)
+
+    def refresh(self):
+        """Reload after the data changed: re-run the search, or the listing."""
+        self.clear()
+        if self.entry.get().strip():
+            self.run()
+        else:
+            self.table.reload()
+
+    def run(self):
+        self._after_id = None
+        term = self.entry.get().strip().casefold()
+        if term == self._term:
+            return
+        if not term:
+            self.clear()
+            self.table.reload()
+            return
+
+        previous, self._term = self._term, term
+        self._shown = self.limit
+        if self._complete and previous and previous in term:
+            self._generation += 1
+            self._rows = [row for row in self._rows if self._matches(row, term)]
+            self._show()
+            return
+        self._query()
+
+    def show_more(self):
+        self._shown += self.limit
+        if self._complete:
+            self._show()
+        else:
+            self._query()
+
+    def _matches(self, row, term: str) -> bool:
+        return any(term in str(getattr(row, column)).casefold() for column in self.columns)
+
+    def _query(self):
+        self._generation += 1
+        generation, term, limit = self._generation, self._term, self._shown
+        # One extra row tells whether there is more to show
+        self.table.runner.submit(
+            lambda: self.search(term, limit + 1),
+            lambda rows: self._on_results(generation, rows, limit),
+            on_error=self.table._on_error,
+            key=self.table.key,
+            description=self.description
+        )
+
+    def _on_results(self, generation: int, rows: List[Any], limit: int):
+        if generation != self._generation:
+            return
+        self._rows = rows
+        self._complete = len(rows) <= limit
+        self._show()
+
+    def _show(self):
+        self.table.show_rows(self._rows[:self._shown])
+        has_more = not self._complete or len(self._rows) > self._shown
+        self.more_button.config(state=tk.NORMAL if has_more else tk.DISABLED)